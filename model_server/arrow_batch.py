@@ -0,0 +1,94 @@
+"""
+Arrow IPC transport for bulk batches.
+
+A request body is an Arrow IPC stream with a text column and an ID column. The response is an
+Arrow IPC stream with one record batch: the ID column, passed through untouched, and the results.
+Distinct texts are found with Arrow compute kernels, so only the distinct texts become Python
+strings (the model needs them). The IDs never leave Arrow memory, and results are copied back to
+repeated texts with a vectorized take.
+"""
+from typing import Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+ENTITY_TYPE = pa.struct([
+    ("text", pa.string()),
+    ("label", pa.string()),
+    ("start", pa.int32()),
+    ("end", pa.int32()),
+])
+
+
+class ArrowBatchError(ValueError):
+    """The request body is not a usable Arrow IPC stream"""
+
+
+class ArrowBatch:
+    """A parsed request: IDs, distinct texts, and the distinct-text index of every row"""
+
+    def __init__(self, ids: pa.Array, unique_texts: List[str], indices: pa.Array, id_column: str):
+        self.ids = ids
+        self.unique_texts = unique_texts
+        self.indices = indices
+        self.id_column = id_column
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def read_batch(body: bytes, text_column: str = "text", id_column: str = "id") -> ArrowBatch:
+    """Parse an Arrow IPC stream body; the buffers are read in place, not copied"""
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise ArrowBatchError(f"Invalid Arrow IPC stream: {e}") from e
+    for column in (text_column, id_column):
+        if column not in table.column_names:
+            raise ArrowBatchError(f"Column {column} not found; columns are {table.column_names}")
+    texts = table.column(text_column)
+    if not (pa.types.is_string(texts.type) or pa.types.is_large_string(texts.type)):
+        raise ArrowBatchError(f"Column {text_column} must be a string column, got {texts.type}")
+
+    texts = pc.fill_null(texts, "")
+    unique = pc.unique(texts)
+    indices = pc.index_in(texts, value_set=unique).combine_chunks()
+    return ArrowBatch(table.column(id_column).combine_chunks(), unique.to_pylist(), indices, id_column)
+
+
+def entities_batch(batch: ArrowBatch, unique_entities: List[List[Dict]]) -> pa.RecordBatch:
+    """ID column plus an `entities` list<struct<text, label, start, end>> column"""
+    flat = [entity for entities in unique_entities for entity in entities]
+    offsets = np.zeros(len(unique_entities) + 1, dtype=np.int32)
+    np.cumsum([len(entities) for entities in unique_entities], out=offsets[1:])
+    values = pa.StructArray.from_arrays([
+        pa.array([entity["text"] for entity in flat], pa.string()),
+        pa.array([entity["label"] for entity in flat], pa.string()),
+        pa.array([entity["start"] for entity in flat], pa.int32()),
+        pa.array([entity["end"] for entity in flat], pa.int32()),
+    ], fields=list(ENTITY_TYPE))
+    per_text = pa.ListArray.from_arrays(pa.array(offsets), values)
+    return pa.RecordBatch.from_arrays([batch.ids, per_text.take(batch.indices)], names=[batch.id_column, "entities"])
+
+
+def scores_batch(batch: ArrowBatch, unique_scores: List[Dict[str, float]], labels: List[str]) -> pa.RecordBatch:
+    """ID column plus one float64 score column per label"""
+    if batch.id_column in labels:
+        raise ArrowBatchError(f"Label {batch.id_column} collides with the ID column")
+    columns = [
+        pa.array(np.fromiter((scores[label] for scores in unique_scores), dtype=np.float64,
+                             count=len(unique_scores))).take(batch.indices)
+        for label in labels
+    ]
+    return pa.RecordBatch.from_arrays([batch.ids] + columns, names=[batch.id_column] + list(labels))
+
+
+def write_batch(record_batch: pa.RecordBatch) -> memoryview:
+    """Serialize one record batch as an Arrow IPC stream"""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, record_batch.schema) as writer:
+        writer.write_batch(record_batch)
+    return memoryview(sink.getvalue())
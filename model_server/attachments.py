@@ -0,0 +1,276 @@
+"""
+Text extraction for announcement PDF attachments.
+
+Every announcement row names its PDF in PDF_URL (ATTACHMENTNAME in some exports). Headlines
+are often boilerplate ("Regulation 30 ..."), so the attachment text is what actually says what
+the filing is about. AttachmentTextStore extracts it from locally stored PDFs in worker
+processes (pdf_extract.py) and caches it on disk, one text file per attachment name. Classifiers
+and the API only read the cache: a missing entry schedules extraction in the background and the
+caller carries on without the attachment text, so extraction never blocks classification. Each attachment is
+extracted once; PDFs that cannot be read are cached as empty text.
+
+Rows classified before their PDF is cached go without its text, so for batch runs pre-extract
+first:
+    python attachments.py Jan22_bse_announcements.csv --attachment-dir /data/bse_pdfs
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+ATTACHMENT_DIR = os.environ.get("ATTACHMENT_DIR", os.path.join(_HERE, "attachments"))
+ATTACHMENT_CACHE_DIR = os.environ.get("ATTACHMENT_CACHE_DIR", os.path.join(_HERE, "attachment_cache"))
+
+# Keyword rules only need the opening pages; this also bounds cache size and NER cost
+DEFAULT_MAX_CHARS = 20000
+
+_WORD = re.compile(r"\S+")
+
+# Extraction worker program (see pdf_extract.py)
+_WORKER = os.path.join(_HERE, "pdf_extract.py")
+
+
+def pdf_available() -> bool:
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ExtractorPool:
+    """
+    Worker threads, each driving one pdf_extract.py process over its stdin and stdout.
+    A process that dies (e.g. on a PDF that crashes the parser) fails its task and is
+    started again for the next one.
+    """
+
+    def __init__(self, workers: int):
+        self._tasks = queue.SimpleQueue()
+        self._threads = [threading.Thread(target=self._work, name=f"pdf-extract-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, pdf_path: str, cache_path: str, max_chars: int) -> Future:
+        future = Future()
+        self._tasks.put((future, [pdf_path, cache_path, max_chars]))
+        return future
+
+    def _work(self):
+        process = None
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    return
+                future, args = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if process is None:
+                        process = subprocess.Popen([sys.executable, _WORKER], stdin=subprocess.PIPE,
+                                                   stdout=subprocess.PIPE, text=True, encoding="utf-8")
+                    process.stdin.write(json.dumps(args) + "\n")
+                    process.stdin.flush()
+                    answer = process.stdout.readline()
+                    if not answer:
+                        raise RuntimeError(f"extractor process exited with code {process.wait()}")
+                    future.set_result(tuple(json.loads(answer)))
+                except Exception as e:
+                    if process is not None:
+                        process.kill()
+                        process.wait()
+                        process = None
+                    future.set_exception(e)
+        finally:
+            if process is not None:
+                process.stdin.close()
+                process.wait()
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        if cancel_futures:
+            while True:
+                try:
+                    task = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                task[0].cancel()
+        for _ in self._threads:
+            self._tasks.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class AttachmentTextStore:
+    """On-disk cache of attachment text, filled in the background by a pool of extractor processes"""
+
+    def __init__(self, attachment_dir: str = ATTACHMENT_DIR, cache_dir: str = ATTACHMENT_CACHE_DIR,
+                 max_workers: Optional[int] = None, max_chars: int = DEFAULT_MAX_CHARS):
+        self.attachment_dir = attachment_dir
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_chars = max_chars
+        self.stats = {"extracted": 0, "failed": 0, "missing": 0}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.RLock()
+        self._pool: Optional[_ExtractorPool] = None
+        self._warned = False
+
+    @staticmethod
+    def _name(name) -> Optional[str]:
+        """Cache key for an attachment column value; the bare file name, or None for empty cells"""
+        if not isinstance(name, str):
+            return None
+        name = os.path.basename(name.strip())
+        return name or None
+
+    def cache_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name + ".txt")
+
+    def get(self, name) -> Optional[str]:
+        """Cached text of an attachment, or None if it has not been extracted (yet). Never extracts."""
+        name = self._name(name)
+        if name is None:
+            return None
+        try:
+            with open(self.cache_path(name), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def text(self, name) -> str:
+        """Cached text, or an empty string; schedules extraction of attachments not cached yet"""
+        text = self.get(name)
+        if text is None:
+            self.submit([name])
+            return ""
+        return text
+
+    def submit(self, names: Iterable) -> int:
+        """
+        Queue extraction of the attachments that are stored locally but not cached or queued yet.
+        Returns immediately with the number of attachments queued.
+        """
+        if not pdf_available():
+            if not self._warned:
+                logger.warning("pypdf is not installed; attachment text extraction is disabled")
+                self._warned = True
+            return 0
+        queued = 0
+        with self._lock:
+            for name in names:
+                name = self._name(name)
+                if name is None or name in self._pending or os.path.exists(self.cache_path(name)):
+                    continue
+                pdf_path = os.path.join(self.attachment_dir, name)
+                if not os.path.exists(pdf_path):
+                    self.stats["missing"] += 1
+                    continue
+                future = self._executor().submit(pdf_path, self.cache_path(name), self.max_chars)
+                self._pending[name] = future
+                future.add_done_callback(lambda done, name=name: self._finished(name, done))
+                queued += 1
+        return queued
+
+    def _executor(self) -> _ExtractorPool:
+        if self._pool is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._pool = _ExtractorPool(self.max_workers)
+        return self._pool
+
+    def _finished(self, name: str, future: Future):
+        with self._lock:
+            self._pending.pop(name, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None and future.result()[1]:
+                self.stats["extracted"] += 1
+            else:
+                self.stats["failed"] += 1
+                logger.warning("Could not extract text from attachment %s: %s", name, error or "unreadable PDF")
+
+    def extract_all(self, names: Iterable) -> Dict[str, int]:
+        """Extract every uncached attachment and wait for the pool to finish"""
+        self.submit(names)
+        with self._lock:
+            pending = list(self._pending.values())
+        wait(pending)
+        return self.status()
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending), workers=self.max_workers)
+
+    def close(self, wait_for_pending: bool = False):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait_for_pending, cancel_futures=not wait_for_pending)
+            self._pool = None
+
+
+def attachment_column(columns: Iterable[str]) -> Optional[str]:
+    """Name of the attachment column in a frame's columns (PDF_URL or one of its aliases)"""
+    from bse_classification import COLUMN_ALIASES
+
+    columns = set(columns)
+    for candidate in ["PDF_URL"] + COLUMN_ALIASES["PDF_URL"]:
+        if candidate in columns:
+            return candidate
+    return None
+
+
+def chunk_text(text: str, max_words: int = 200) -> List[Tuple[int, str]]:
+    """
+    Split a long text into (character offset, chunk) pieces of at most `max_words` words,
+    so each piece fits the NER model's input window. Chunks are cut at whitespace.
+    """
+    words = [match.span() for match in _WORD.finditer(text)]
+    return [
+        (words[i][0], text[words[i][0]:words[min(i + max_words, len(words)) - 1][1]])
+        for i in range(0, len(words), max_words)
+    ]
+
+
+def main():
+    from bse_classification import iter_rows
+
+    parser = argparse.ArgumentParser(description="Extract and cache the text of announcement PDF attachments")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--attachment-dir", default=ATTACHMENT_DIR)
+    parser.add_argument("--cache-dir", default=ATTACHMENT_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS)
+    args = parser.parse_args()
+
+    if not pdf_available():
+        parser.error("pypdf is required: pip install pypdf")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    names = {name for path in args.csv_files for (name,) in iter_rows(path, ["PDF_URL"]) if name}
+    store = AttachmentTextStore(args.attachment_dir, args.cache_dir, args.workers, args.max_chars)
+    print(f"{len(names)} attachments referenced, extracting with {store.max_workers} processes...")
+    start_time = time.perf_counter()
+    try:
+        status = store.extract_all(names)
+    finally:
+        store.close(wait_for_pending=True)
+    elapsed = time.perf_counter() - start_time
+    print(f"Extracted {status['extracted']} in {elapsed:.1f}s "
+          f"({status['failed']} unreadable, {status['missing']} not stored locally)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Autotuner for CPU inference settings.
+
+Finds the torch thread count, micro-batch size and max-wait window that give the
+highest NER throughput on this host while keeping p95 latency under an SLO. Each
+trial drives a BatchScheduler with a fixed number of concurrent requests drawn from
+a sample corpus. The server tunes through its live scheduler, so no second inference
+thread competes with it, and puts its settings back afterwards. The search is
+coordinate-wise: threads first, then batch size, then max-wait, each with the best
+values found so far.
+
+The result is saved as a profile (tuning_profile.json by default). main.py loads it at
+boot when it was made for the same CPU count, model and torch thread settings.
+
+Examples:
+    python autotune.py --slo-ms 250
+    python autotune.py --batch-sizes 4 8 16 --max-wait-ms 0 5 --threads 2 4 --requests 128
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from scheduler import INTERACTIVE, BatchScheduler
+from workload import NER_LABELS, load_corpus, summarize_latencies
+
+PROFILE_PATH = os.environ.get(
+    "TUNING_PROFILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tuning_profile.json")
+)
+DEFAULT_BATCH_SIZES = [1, 4, 8, 16, 32]
+DEFAULT_MAX_WAIT_MS = [0.0, 2.0, 5.0, 10.0]
+
+
+def host_info() -> Dict:
+    """What makes one node type differ from another for tuning purposes"""
+    return {"cpus": os.cpu_count(), "machine": platform.machine(), "processor": platform.processor()}
+
+
+def tuning_key(model: str) -> Dict:
+    """What a profile is only valid for: the CPU count, the model and the torch thread settings"""
+    try:
+        import torch
+        interop_threads = torch.get_num_interop_threads()
+    except ImportError:
+        interop_threads = None
+    return {"cpus": os.cpu_count(), "model": model, "torch_num_threads": os.environ.get("TORCH_NUM_THREADS"),
+            "interop_threads": interop_threads}
+
+
+def default_thread_grid(cpus: Optional[int] = None) -> List[int]:
+    cpus = cpus or os.cpu_count() or 1
+    grid = {cpus, max(1, cpus // 2)}
+    threads = 1
+    while threads < cpus:
+        grid.add(threads)
+        threads *= 2
+    return sorted(grid)
+
+
+def get_torch_threads() -> Optional[int]:
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch.get_num_threads()
+
+
+def set_torch_threads(threads: int) -> bool:
+    """Set intra-op threads for torch; False when torch is not importable"""
+    try:
+        import torch
+    except ImportError:
+        return False
+    torch.set_num_threads(int(threads))
+    return True
+
+
+def load_profile(model: str, path: str = PROFILE_PATH) -> Optional[Dict]:
+    """The saved profile, or None if missing, unreadable or tuned for a different key (see tuning_key)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    key = tuning_key(model)
+    if profile.get("key") != key:
+        print(f"Ignoring tuning profile {path}: tuned for {profile.get('key')}, this server runs {key}")
+        return None
+    return profile
+
+
+def save_profile(profile: Dict, path: str = PROFILE_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def apply_profile(profile: Dict, scheduler: BatchScheduler):
+    settings = profile["settings"]
+    if settings.get("torch_threads"):
+        set_torch_threads(settings["torch_threads"])
+    scheduler.configure(max_batch_size=settings.get("max_batch_size"), max_wait_ms=settings.get("max_wait_ms"))
+
+
+async def run_trial(scheduler: BatchScheduler, corpus: List[str], labels: List[str], concurrency: int,
+                    requests: int, model: Optional[str] = None) -> Dict:
+    """Closed loop: `concurrency` callers each send their next text as soon as the last one returns"""
+    latencies, errors = [], 0
+    # Same seeded sample in every trial, so trials differ only in their settings
+    texts = iter(random.Random(0).choices(corpus, k=requests))
+
+    async def caller():
+        nonlocal errors
+        for text in texts:
+            start_time = time.perf_counter()
+            try:
+                await scheduler.predict(text, labels, model=model)
+                latencies.append((time.perf_counter() - start_time) * 1000)
+            except Exception:
+                errors += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return summarize_latencies(latencies, errors, time.perf_counter() - start_time)
+
+
+def _best(trials: List[Dict], slo_ms: float) -> Dict:
+    """Highest throughput within the SLO; lowest p95 if nothing meets it"""
+    within = [trial for trial in trials if not trial["errors"] and trial.get("p95_ms", float("inf")) <= slo_ms]
+    if within:
+        return max(within, key=lambda trial: trial["rps"])
+    return min(trials, key=lambda trial: trial.get("p95_ms", float("inf")))
+
+
+async def autotune(scheduler: BatchScheduler, corpus: List[str], labels: List[str] = NER_LABELS,
+                   slo_ms: float = 250.0, concurrency: int = 32, requests: int = 256,
+                   threads: Optional[List[int]] = None, batch_sizes: Optional[List[int]] = None,
+                   max_waits_ms: Optional[List[float]] = None, model: Optional[str] = None,
+                   log: Callable[[str], None] = print) -> Dict:
+    """
+    Search the settings grid by running trials through `scheduler` and return a profile (not
+    saved). The scheduler's batching settings and the torch thread count are restored afterwards.
+    """
+    model = model or scheduler.registry.default
+    threads = threads or default_thread_grid()
+    batch_sizes = batch_sizes or DEFAULT_BATCH_SIZES
+    max_waits_ms = max_waits_ms if max_waits_ms is not None else DEFAULT_MAX_WAIT_MS
+    original_threads = get_torch_threads()
+    if original_threads is None:
+        threads = [None]
+    original = scheduler.stats()[INTERACTIVE]
+
+    current = {"torch_threads": threads[-1], "max_batch_size": 8 if 8 in batch_sizes else batch_sizes[0],
+               "max_wait_ms": 5.0 if 5.0 in max_waits_ms else max_waits_ms[0]}
+    trials = []
+
+    async def trial(settings):
+        if settings["torch_threads"]:
+            set_torch_threads(settings["torch_threads"])
+        scheduler.configure(max_batch_size=settings["max_batch_size"], max_wait_ms=settings["max_wait_ms"])
+        # Unmeasured warm-up so allocator and thread-pool start-up costs are not counted
+        await run_trial(scheduler, corpus, labels, concurrency, concurrency, model)
+        summary = await run_trial(scheduler, corpus, labels, concurrency, requests, model)
+        result = dict(settings, **summary)
+        trials.append(result)
+        log(f"threads={settings['torch_threads']} batch={settings['max_batch_size']} "
+            f"wait={settings['max_wait_ms']}ms: {summary['rps']} rps, p95 {summary.get('p95_ms')} ms")
+        return result
+
+    try:
+        for key, values in (("torch_threads", threads), ("max_batch_size", batch_sizes),
+                            ("max_wait_ms", max_waits_ms)):
+            stage = [await trial(dict(current, **{key: value})) for value in values]
+            best = _best(stage, slo_ms)
+            current = {name: best[name] for name in current}
+    finally:
+        if original_threads is not None:
+            set_torch_threads(original_threads)
+        scheduler.configure(max_batch_size=original["max_batch_size"], max_wait_ms=original["max_wait_ms"])
+
+    best = _best(trials, slo_ms)
+    return {
+        "created_at": datetime.now().isoformat(),
+        "key": tuning_key(model),
+        "host": host_info(),
+        "model": model,
+        "labels": labels,
+        "slo_p95_ms": slo_ms,
+        "concurrency": concurrency,
+        "meets_slo": best.get("p95_ms", float("inf")) <= slo_ms,
+        "settings": {name: best[name] for name in ("torch_threads", "max_batch_size", "max_wait_ms")},
+        "result": {name: best[name] for name in ("rps", "p50_ms", "p95_ms", "p99_ms") if name in best},
+        "trials": trials,
+    }
+
+
+def main():
+    from model_cache import enable_offline_cache, resolve_model_path
+    enable_offline_cache()
+    from gliner import GLiNER
+    from model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Tune NER batching and thread settings for this host")
+    parser.add_argument("--corpus", default="Jan22_bse_announcements.csv")
+    parser.add_argument("--corpus-size", type=int, default=500)
+    parser.add_argument("--model", default="gliner-medium")
+    parser.add_argument("--source", default="urchade/gliner_mediumv2.1", help="Used when the model is not cached")
+    parser.add_argument("--slo-ms", type=float, default=250.0, help="p95 latency target")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent requests during each trial")
+    parser.add_argument("--requests", type=int, default=256, help="Measured requests per trial")
+    parser.add_argument("--threads", type=int, nargs="+")
+    parser.add_argument("--batch-sizes", type=int, nargs="+")
+    parser.add_argument("--max-wait-ms", type=float, nargs="+")
+    parser.add_argument("--output", default=PROFILE_PATH)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.corpus_size)
+    registry = ModelRegistry(loader=GLiNER.from_pretrained, default=args.model)
+    registry.register(args.model, resolve_model_path(args.model) or args.source)
+    registry.load(args.model, wait=True)
+
+    print(f"Tuning on {len(corpus)} texts, {args.concurrency} concurrent requests, p95 SLO {args.slo_ms} ms")
+    # Thread counts to try; pinned by TORCH_NUM_THREADS, as the server would be
+    threads = [int(os.environ["TORCH_NUM_THREADS"])] if os.environ.get("TORCH_NUM_THREADS") else args.threads
+
+    async def run():
+        scheduler = BatchScheduler(registry)
+        try:
+            return await autotune(scheduler, corpus, slo_ms=args.slo_ms, concurrency=args.concurrency,
+                                  requests=args.requests, threads=threads, batch_sizes=args.batch_sizes,
+                                  max_waits_ms=args.max_wait_ms)
+        finally:
+            await scheduler.stop()
+
+    profile = asyncio.run(run())
+    save_profile(profile, args.output)
+    status = "meets" if profile["meets_slo"] else "does NOT meet"
+    print(f"Best: {profile['settings']} -> {profile['result']} ({status} the SLO)")
+    print(f"Saved tuning profile to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,61 +3,25 @@ import os
 from datetime import datetime
 import json
 from pathlib import Path
+from attachments import attachment_column
+from category_stats import category_summary
+from dedup import Deduplicator
+from rules import get_rule_store
 
 class BSEAnnouncementClassifier:
-    def __init__(self):
+    def __init__(self, dedup_threshold=None, rule_store=None, attachments=None):
+        # Duplicate rows are matched on their exact text; a Jaccard threshold (e.g. 0.9) also
+        # collapses near-duplicate filings, which only pays off when rows are slow to classify
+        self.dedup_threshold = dedup_threshold
+        # Optional attachments.AttachmentTextStore; cached PDF text is added to the combined text
+        self.attachments = attachments
         self.required_columns = ['HEADLINE', 'DESCRIPTION_1', 'ANNOUNCEMENT_TYPE', 'COMPANY_NAME', 'DT']
-        self.patterns = {
-            'Financial Results': [
-                'financial result', 'quarterly result', 'annual result',
-                'unaudited financial', 'audited financial', 'financial statement',
-                'statement of profit', 'statement of loss'
-            ],
-            'Board Meeting': [
-                'board meeting', 'meeting of board', 'board of director',
-                'board meeting intimation'
-            ],
-            'Shareholder Meeting': [
-                'agm', 'annual general meeting', 'egm', 'extraordinary general meeting',
-                'postal ballot', 'shareholder meeting', 'general meeting'
-            ],
-            'Investor Relations': [
-                'investor meet', 'analyst meet', 'earnings call', 'investor presentation',
-                'investor conference', 'conference call', 'earnings presentation'
-            ],
-            'Regulatory Compliance': [
-                'regulation 30', 'regulation 33', 'sebi regulation', 'compliance certificate',
-                'statutory compliance', 'regulatory requirement'
-            ],
-            'Corporate Action': [
-                'dividend', 'bonus', 'stock split', 'rights issue', 'buyback',
-                'share transfer', 'capital reduction'
-            ],
-            'Press Release': [
-                'press release', 'media release', 'news release',
-                'press statement', 'media statement'
-            ],
-            'Management Changes': [
-                'appointment of director', 'resignation of director',
-                'key managerial', 'change in director', 'new appointment'
-            ],
-            'Trading Update': [
-                'trading window', 'insider trading', 'trading update',
-                'trading statement', 'market update'
-            ],
-            'Business Update': [
-                'business update', 'operational update', 'company update',
-                'corporate update', 'strategic update'
-            ],
-            'Credit Rating': [
-                'credit rating', 'rating agency', 'credit update',
-                'rating revision', 'rating reaffirm'
-            ],
-            'Merger/Acquisition': [
-                'merger', 'acquisition', 'amalgamation', 'takeover',
-                'scheme of arrangement'
-            ]
-        }
+        self.rule_store = rule_store or get_rule_store()
+
+    @property
+    def patterns(self):
+        """Keyword patterns of the current rules version"""
+        return self.rule_store.current.announcement_types.keywords
         
     def validate_file(self, df):
         """Validate if the DataFrame has required columns"""
@@ -71,31 +35,26 @@ class BSEAnnouncementClassifier:
         headline = str(row['HEADLINE']).lower()
         description = str(row['DESCRIPTION_1']).lower() if pd.notna(row['DESCRIPTION_1']) else ''
         ann_type = str(row['ANNOUNCEMENT_TYPE']).lower() if pd.notna(row['ANNOUNCEMENT_TYPE']) else ''
-        return f"{headline} {description} {ann_type}"
+        text = f"{headline} {description} {ann_type}"
+        if self.attachments is not None:
+            column = attachment_column(row.index)
+            attachment_text = self.attachments.text(row[column]) if column else ''
+            if attachment_text:
+                text += " " + attachment_text.lower()
+        return text
 
-    def classify_row(self, row):
+    def classify_row(self, row, rules=None):
         """Classify a single announcement"""
+        return self.classify_text(self.get_combined_text(row), rules)
+
+    def classify_text(self, text, rules=None):
+        """Classify the combined announcement text with the compiled rule set"""
         start_time = datetime.now()
-        
-        text = self.get_combined_text(row)
-        
-        # Check each pattern
-        for category, pattern_list in self.patterns.items():
-            if any(pattern in text for pattern in pattern_list):
-                end_time = datetime.now()
-                classification_time = (end_time - start_time).total_seconds() * 1000  # Convert to milliseconds
-                return category, classification_time
-                
-        # Special case for board meetings with financial results
-        if any(term in text for term in self.patterns['Board Meeting']):
-            if any(term in text for term in self.patterns['Financial Results']):
-                end_time = datetime.now()
-                classification_time = (end_time - start_time).total_seconds() * 1000
-                return 'Financial Results - Board Meeting', classification_time
-        
+        rules = rules or self.rule_store.current.announcement_types
+        category = rules.classify(text)
         end_time = datetime.now()
-        classification_time = (end_time - start_time).total_seconds() * 1000
-        return 'Other Announcements', classification_time
+        classification_time = (end_time - start_time).total_seconds() * 1000  # Convert to milliseconds
+        return category, classification_time
 
     def process_file(self, input_file, output_dir=None):
         """Process a single file"""
@@ -112,14 +71,30 @@ class BSEAnnouncementClassifier:
             classification_times = []
             classifications = []
             
-            # Classify each row and track time
+            # Classify each row and track time. Duplicate filings are collapsed
+            # so each cluster is classified once and the result copied to its members.
+            # The whole file is classified with one rules version, even if it is hot-swapped meanwhile
             total_rows = len(df)
+            rules = self.rule_store.current
+            if self.dedup_threshold is None:
+                deduplicator = Deduplicator(exact_only=True)
+            else:
+                deduplicator = Deduplicator(threshold=self.dedup_threshold)
+            cluster_classifications = []
+            if self.attachments is not None and attachment_column(df.columns):
+                # Queue extraction for the whole file up front; rows use whatever is cached
+                self.attachments.submit(df[attachment_column(df.columns)].dropna())
             for idx, row in df.iterrows():
-                classification, time_taken = self.classify_row(row)
-                classifications.append(classification)
-                classification_times.append(time_taken)
+                text = self.get_combined_text(row)
+                cluster_id, is_new = deduplicator.assign(text)
+                if is_new:
+                    classification, time_taken = self.classify_text(text, rules.announcement_types)
+                    cluster_classifications.append(classification)
+                    classification_times.append(time_taken)
+                classifications.append(cluster_classifications[cluster_id])
+            deduplicator.stats.work_time_ms = sum(classification_times)
             
-            df['Row_Classification'] = classifications
+            df['Row_Classification'] = pd.Categorical(classifications)
             
             # Calculate and display timing statistics
             avg_time = sum(classification_times) / len(classification_times)
@@ -134,10 +109,13 @@ class BSEAnnouncementClassifier:
             print(f"Average time per row: {avg_time:.2f} ms")
             print(f"Maximum time for a row: {max_time:.2f} ms")
             print(f"Minimum time for a row: {min_time:.2f} ms")
+            print(deduplicator.stats.summary())
             print("-" * 30)
             
             # Generate statistics
             stats = self.generate_statistics(df)
+            stats['deduplication'] = deduplicator.stats.to_dict()
+            stats['rules_version'] = rules.version
             
             # Save results
             if output_dir:
@@ -183,22 +161,7 @@ class BSEAnnouncementClassifier:
 
     def generate_statistics(self, df):
         """Generate statistics for the classification results"""
-        total_announcements = len(df)
-        classification_counts = df['Row_Classification'].value_counts()
-        
-        stats = {
-            'total_announcements': total_announcements,
-            'categories': {}
-        }
-        
-        for category, count in classification_counts.items():
-            percentage = (count / total_announcements) * 100
-            stats['categories'][category] = {
-                'count': int(count),
-                'percentage': round(percentage, 2)
-            }
-        
-        return stats
+        return category_summary(df['Row_Classification'])
 
     def save_results(self, df, stats, input_file, output_dir):
         """Save classification results and statistics"""
@@ -0,0 +1,254 @@
+"""
+Load-testing and benchmark harness for the NLP API.
+
+Drives the FastAPI app either in-process (ASGI transport, no sockets) or over a
+local HTTP socket, at a fixed concurrency (closed loop) or a fixed arrival rate
+(open loop, Poisson arrivals). The request corpus is built from the BSE
+announcements CSV. Also measures offline throughput of the rule classifiers.
+
+Examples:
+    python benchmark.py --endpoints predict classify --concurrency 8 --requests 500
+    python benchmark.py --url http://127.0.0.1:8000 --rate 50 --duration 30
+    python benchmark.py --offline-only
+    python benchmark.py --compare benchmark_results/old.json benchmark_results/new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+
+from workload import NER_LABELS, SENTIMENT_LABELS, load_corpus, summarize_latencies
+
+
+def build_payload(endpoint: str, text: str) -> Dict:
+    if endpoint == "predict":
+        return {"text": text, "labels": NER_LABELS, "threshold": 0.5}
+    if endpoint == "classify":
+        return {"text": text, "labels": SENTIMENT_LABELS}
+    if endpoint == "analyze":
+        return {"text": text, "labels": NER_LABELS, "sentiment_labels": SENTIMENT_LABELS}
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+async def _send(client: httpx.AsyncClient, endpoint: str, text: str, latencies: List[float],
+                start_time: float = None) -> bool:
+    """Send one request; latency is measured from start_time (the scheduled arrival) when given"""
+    start_time = start_time or time.perf_counter()
+    try:
+        response = await client.post(f"/{endpoint}", json=build_payload(endpoint, text))
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    if ok:
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return ok
+
+
+async def run_closed_loop(client, endpoint, corpus, concurrency, total_requests, duration_s):
+    """`concurrency` workers each send their next request as soon as the previous one returns"""
+    latencies, errors = [], 0
+    sent = 0
+    deadline = time.perf_counter() + duration_s if duration_s else None
+
+    async def worker():
+        nonlocal sent, errors
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if deadline is None and sent >= total_requests:
+                return
+            text = corpus[sent % len(corpus)]
+            sent += 1
+            if not await _send(client, endpoint, text, latencies):
+                errors += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize_latencies(latencies, errors, time.perf_counter() - start_time)
+
+
+async def run_open_loop(client, endpoint, corpus, rate, total_requests, duration_s, max_in_flight):
+    """Poisson arrivals at `rate` requests/second, independent of how fast the server answers"""
+    latencies, errors = [], 0
+    in_flight = asyncio.Semaphore(max_in_flight)
+    tasks = []
+    rng = random.Random(0)
+
+    async def fire(text, scheduled):
+        nonlocal errors
+        # Latency counts from the scheduled arrival, so time spent waiting for a free slot
+        # under overload is included (no coordinated omission)
+        async with in_flight:
+            if not await _send(client, endpoint, text, latencies, start_time=scheduled):
+                errors += 1
+
+    start_time = time.perf_counter()
+    deadline = start_time + duration_s if duration_s else None
+    scheduled = start_time
+    index = 0
+    while True:
+        if deadline is not None and scheduled >= deadline:
+            break
+        if deadline is None and index >= total_requests:
+            break
+        tasks.append(asyncio.create_task(fire(corpus[index % len(corpus)], scheduled)))
+        index += 1
+        # Arrivals follow their own clock; a late wake-up does not shift later arrivals
+        scheduled += rng.expovariate(rate)
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+    await asyncio.gather(*tasks)
+    return summarize_latencies(latencies, errors, time.perf_counter() - start_time)
+
+
+def make_client(url: str = None, timeout: float = 60.0) -> httpx.AsyncClient:
+    """HTTP client against a running server, or an in-process ASGI client"""
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+    from main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=timeout)
+
+
+async def run_endpoints(args, corpus) -> Dict:
+    results = {}
+    async with make_client(args.url) as client:
+        for endpoint in args.endpoints:
+            # Warm up so model loading and first-call costs don't skew the tail
+            for text in corpus[:args.warmup]:
+                await _send(client, endpoint, text, [])
+            if args.rate:
+                summary = await run_open_loop(client, endpoint, corpus, args.rate, args.requests,
+                                              args.duration, args.max_in_flight)
+            else:
+                summary = await run_closed_loop(client, endpoint, corpus, args.concurrency,
+                                                args.requests, args.duration)
+            results[endpoint] = summary
+            print_summary(endpoint, summary)
+    return results
+
+
+def benchmark_offline(corpus: List[str], repeat: int = 5) -> Dict:
+    """Throughput of the in-process rule classifiers over the corpus"""
+    from batch_classification import BSEAnnouncementClassifier
+    from classification_model import TextClassifier
+
+    results = {}
+    bse_classifier = BSEAnnouncementClassifier()
+    lowered = [text.lower() for text in corpus]
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for text in lowered:
+            bse_classifier.classify_text(text)
+    elapsed = time.perf_counter() - start_time
+    results["BSEAnnouncementClassifier"] = {
+        "texts": len(corpus) * repeat,
+        "elapsed_s": round(elapsed, 4),
+        "texts_per_s": round(len(corpus) * repeat / elapsed, 2),
+    }
+
+    text_classifier = TextClassifier()
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            text_classifier.predict_proba(text, SENTIMENT_LABELS)
+    elapsed = time.perf_counter() - start_time
+    results["TextClassifier"] = {
+        "texts": len(corpus) * repeat,
+        "elapsed_s": round(elapsed, 4),
+        "texts_per_s": round(len(corpus) * repeat / elapsed, 2),
+    }
+
+    for name, summary in results.items():
+        print(f"{name}: {summary['texts_per_s']} texts/s ({summary['texts']} texts in {summary['elapsed_s']} s)")
+    return results
+
+
+def print_summary(endpoint: str, summary: Dict):
+    print(f"\n/{endpoint}: {summary['requests']} requests, {summary['errors']} errors, {summary['rps']} RPS")
+    if "p50_ms" in summary:
+        print(f"  latency ms: p50={summary['p50_ms']} p95={summary['p95_ms']} "
+              f"p99={summary['p99_ms']} max={summary['max_ms']}")
+
+
+def compare_results(old_file: str, new_file: str):
+    """Print per-endpoint RPS and p99 changes between two saved runs"""
+    with open(old_file) as f:
+        old = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+
+    print(f"\nComparing {old_file} -> {new_file}")
+    print("=" * 50)
+    for endpoint, summary in new.get("endpoints", {}).items():
+        before = old.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            if metric in before and metric in summary and before[metric]:
+                change = (summary[metric] - before[metric]) / before[metric] * 100
+                print(f"/{endpoint} {metric}: {before[metric]} -> {summary[metric]} ({change:+.1f}%)")
+    for name, summary in new.get("offline", {}).items():
+        before = old.get("offline", {}).get(name)
+        if before:
+            change = (summary["texts_per_s"] - before["texts_per_s"]) / before["texts_per_s"] * 100
+            print(f"{name} texts/s: {before['texts_per_s']} -> {summary['texts_per_s']} ({change:+.1f}%)")
+
+
+def save_results(results: Dict, output_dir: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_file = os.path.join(output_dir, f"benchmark_{timestamp}.json")
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"\nSaved benchmark results to: {output_file}")
+    return output_file
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the NLP API and rule classifiers")
+    parser.add_argument("--url", help="Base URL of a running server; omit to drive the app in-process")
+    parser.add_argument("--corpus", default="Jan22_bse_announcements.csv", help="Announcements CSV used as the corpus")
+    parser.add_argument("--corpus-size", type=int, default=None, help="Use only the first N announcements")
+    parser.add_argument("--endpoints", nargs="+", default=["predict", "classify", "analyze"],
+                        choices=["predict", "classify", "analyze"])
+    parser.add_argument("--concurrency", type=int, default=4, help="Closed-loop workers")
+    parser.add_argument("--rate", type=float, default=None, help="Open-loop arrival rate (requests/second)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds per endpoint (overrides --requests)")
+    parser.add_argument("--warmup", type=int, default=5, help="Warm-up requests per endpoint")
+    parser.add_argument("--offline-only", action="store_true", help="Only benchmark the offline classifiers")
+    parser.add_argument("--output-dir", default="benchmark_results")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two saved result files")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    corpus = load_corpus(args.corpus, args.corpus_size)
+    print(f"Loaded {len(corpus)} announcements from {args.corpus}")
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "host": {"platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "settings": {key: value for key, value in vars(args).items() if key != "compare"},
+        "offline": benchmark_offline(corpus),
+    }
+    if not args.offline_only:
+        results["endpoints"] = asyncio.run(run_endpoints(args, corpus))
+
+    save_results(results, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,166 +1,260 @@
 import csv
-from collections import defaultdict
+from collections import Counter
+import logging
 import os
+import shutil
+import sys
+import tempfile
+import time
+from dedup import Deduplicator
+from rules import current_rules
 
-def classify_announcement(headline, description1="", description2=""):
+logger = logging.getLogger(__name__)
+
+# Column layout of the raw BSE export (e.g. Jan22_bse_announcements.csv), which has no header row
+RAW_EXPORT_COLUMNS = [
+    'ID', 'UUID', 'SCRIP_CD', 'ANN_ID', 'HEADLINE', 'DT', 'CREATED_DT', 'FLAG', 'STATUS',
+    'CRITICALITY', 'NEWS_FLAG', 'PDF_URL', 'DESCRIPTION_1', 'DESCRIPTION_2', 'CATEGORY',
+    'FLAG1', 'FLAG2', 'FLAG3', 'URL', 'COMPANY_NAME', 'CATEGORY_ID', 'SUBCATEGORY_ID',
+    'DT_TM', 'CREATED_TM', 'TIME_ELAPSED', 'SCRIP_ID', 'ANNOUNCEMENT_TYPE',
+    'ATTACHMENT_COUNT', 'CREATED_AT', 'UPDATED_AT', 'SCORE'
+]
+
+# Alternative header names used by other exports for the same field
+COLUMN_ALIASES = {
+    'PDF_URL': ['ATTACHMENTNAME'],
+}
+
+def classify_announcement(headline, description1="", description2="", rules=None, attachment_text=""):
     """
-    Classify BSE announcements into predefined categories
+    Classify BSE announcements into predefined categories.
+    attachment_text is the extracted text of the announcement's PDF, when available.
     """
     text = (str(headline) + " " + str(description1) + " " + str(description2)).lower()
+    if attachment_text:
+        text += " " + attachment_text.lower()
     #classification is case sensitive
-    # Define keywords for each category
-    categories = {
-        'Capacity Expansion / New Ventures': ['expansion', 'new venture', 'new plant', 'capacity addition', 'greenfield'],
-        'Joint Ventures / Collaborations': ['joint venture', 'collaboration', 'partnership', 'strategic alliance', 'mou'],
-        'Order Wins': ['order win', 'contract win', 'project award', 'work order'],
-        'Acquisitions': ['acquisition', 'acquire', 'takeover'],
-        'USFDA / Regulatory': ['usfda', 'regulatory', 'approval', 'clearance', 'gmp'],
-        'Merger / Spin-offs': ['merger', 'demerger', 'spin off', 'amalgamation'],
-        'Open Offers / Takeovers': ['open offer', 'takeover offer'],
-        'Buyback': ['buyback', 'buy back', 'share repurchase'],
-        'Stock Split': ['stock split', 'share split', 'sub-division'],
-        'Bonus Issue': ['bonus', 'bonus issue', 'bonus share'],
-        'Offer for Sale': ['offer for sale', 'ofs'],
-        'Rights Issue': ['rights issue', 'rights offering'],
-        'Name Change': ['name change', 'change of name'],
-        'Fund Raising': ['fund raising', 'fund raise', 'qip', 'preferential issue', 'rights issue'],
-        'First Presentation or Concall': ['earnings call', 'investor presentation', 'concall', 'conference call', 'analyst meet'],
-        'Other Important Announcements': []  # Default category
-    }
-    
-    # Check each category
-    for category, keywords in categories.items():
-        for keyword in keywords:
-            if keyword in text:
-                return category
-    
-    return 'Other Important Announcements'
-
-def process_announcements(file_path):
-    """Process the BSE announcements CSV file"""
-    print(f"Processing file: {file_path}")
-    print(f"File exists: {os.path.exists(file_path)}")
-    category_announcements = defaultdict(list)
-    #If category is not in the list, an empty list is created
-    
+
+    # Keywords come from the versioned rules file, compiled once per version
+    rules = rules or current_rules().bse_categories
+    return rules.classify(text)
+
+def resolve_columns(first_row, wanted):
+    """
+    Map the wanted column names to positions using the header row.
+    Returns (positions, has_header); files without a header use RAW_EXPORT_COLUMNS.
+    """
+    header = [name.strip().upper() for name in first_row]
+    has_header = 'HEADLINE' in header
+    if not has_header:
+        header = RAW_EXPORT_COLUMNS
+
+    positions = {}
+    for name in wanted:
+        for candidate in [name] + COLUMN_ALIASES.get(name, []):
+            if candidate in header:
+                positions[name] = header.index(candidate)
+                break
+        else:
+            raise ValueError(f"Column {name} not found in file header")
+    return positions, has_header
+
+def iter_rows(file_path, columns):
+    """
+    Lazily yield one tuple of the requested column values per CSV row.
+    Column positions are resolved once from the header; short rows are skipped.
+    """
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        first_row = next(reader, None)
+        if first_row is None:
+            return
+        positions, has_header = resolve_columns(first_row, columns)
+        indices = [positions[name] for name in columns]
+        min_length = max(indices) + 1
+
+        rows = reader if has_header else _prepend(first_row, reader)
+        skipped = 0
+        for row_number, row in enumerate(rows, start=2 if has_header else 1):
+            if len(row) < min_length:
+                skipped += 1
+                logger.debug("Row %d has insufficient columns: %d", row_number, len(row))
+                continue
+            yield tuple(row[i] for i in indices)
+
+        if skipped:
+            logger.warning("Skipped %d rows with insufficient columns in %s", skipped, file_path)
+
+def _prepend(first_row, reader):
+    yield first_row
+    yield from reader
+
+def process_announcements(file_path, attachments=None, dedup_threshold=None):
+    """
+    Classify the BSE announcements CSV file as a stream.
+    Yields (category, announcement_info) tuples without holding the file in memory.
+    With an attachments.AttachmentTextStore, already extracted PDF text is classified along
+    with the headline; attachments not extracted yet are queued and the row is classified without.
+    Rows with identical text are classified once; a dedup_threshold (Jaccard, e.g. 0.9) also
+    collapses near-duplicate filings, at the cost of a MinHash fingerprint per row.
+    """
+    logger.info("Processing file: %s", file_path)
+    # Duplicate filings share the category of the first member of their cluster.
+    # The index is bounded so memory stays flat on arbitrarily large files.
+    if dedup_threshold is None:
+        deduplicator = Deduplicator(exact_only=True, max_clusters=100000)
+    else:
+        deduplicator = Deduplicator(threshold=dedup_threshold, max_clusters=100000)
+    # One rules version for the whole file, even if a new one is swapped in meanwhile
+    rules = current_rules().bse_categories
+    cluster_categories = {}
+    row_count = 0
+
+    columns = ['HEADLINE', 'DESCRIPTION_1', 'DESCRIPTION_2', 'COMPANY_NAME']
+    if attachments is not None:
+        columns.append('PDF_URL')
+    for row in iter_rows(file_path, columns):
+        headline, description1, description2, company_name = row[:4]
+        row_count += 1
+        attachment_text = attachments.text(row[4]) if attachments is not None else ""
+        # Boilerplate headlines only count as duplicates when their attachments match too
+        cluster_id, is_new = deduplicator.assign(f"{headline} {description1} {description2} {attachment_text}")
+        if is_new:
+            start_time = time.perf_counter()
+            category = classify_announcement(headline, description1, description2, rules, attachment_text)
+            deduplicator.stats.work_time_ms += (time.perf_counter() - start_time) * 1000
+            if cluster_id >= 0:
+                cluster_categories[cluster_id] = category
+        else:
+            category = cluster_categories[cluster_id]
+
+        yield category, {
+            'company': company_name,
+            'headline': headline,
+            'description': description1 if description1 else description2
+        }
+
+    logger.info("Processed %d rows", row_count)
+    logger.info(deduplicator.stats.summary())
+
+def _iter_category_items(category_announcements):
+    """
+    Accept either a {category: [announcements]} mapping, a {category: DataFrame} mapping
+    (see category_stats.group_by_category) or a (category, announcement) stream.
+    Yields (category, company, headline, description) tuples.
+    """
+    if not isinstance(category_announcements, dict):
+        for category, ann in category_announcements:
+            yield category, ann['company'], ann['headline'], ann['description']
+        return
+    for category, announcements in category_announcements.items():
+        if hasattr(announcements, 'columns'):
+            # Walk the three listed columns directly instead of building a dict per row
+            rows = zip(announcements['company'], announcements['headline'], announcements['description'])
+        else:
+            rows = ((ann['company'], ann['headline'], ann['description']) for ann in announcements)
+        for company, headline, description in rows:
+            yield category, company, headline, description
+
+def _format_announcement(company, headline, description):
+    lines = f"\nCompany: {company}\nAnnouncement: {headline}\n"
+    if description:
+        lines += f"Details: {description[:200]}...\n"
+    return lines
+
+def _spill_by_category(category_announcements, spill_dir):
+    """
+    Group a stream of announcements by category using one temporary file per category.
+    Memory use is bounded by the number of categories, not the number of announcements.
+    Returns (counts, spill file paths).
+    """
+    counts = Counter()
+    handles = {}
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            row_count = 0
-            
-            for row in reader:
-                try:
-                    row_count += 1
-                    if len(row) < 19:
-                        print(f"Row {row_count} has insufficient columns: {len(row)}")
-                        continue
-                    # Get the headline, description 1 and description 2 from the row
-                    # The indices are hardcoded as per the CSV file structure
-                    # The description fields are optional and hence the check for length
-                    # The company name is also optional and hence the check for length
-                    headline = row[4]  # HEADLINE
-                    description1 = row[11] if len(row) > 11 else ""  # DESCRIPTION_1
-                    description2 = row[12] if len(row) > 12 else ""  # DESCRIPTION_2
-                    company_name = row[18] if len(row) > 18 else ""  # COMPANY_NAME
-                    category = classify_announcement(headline, description1, description2)
-                    
-                    announcement_info = {
-                        'company': company_name,
-                        'headline': headline,
-                        'description': description1 if description1 else description2
-                    }
-                    
-                    category_announcements[category].append(announcement_info)
-                    
-                except Exception as e:
-                    print(f"Error processing row {row_count}: {e}")
-                    continue
-                    
-            print(f"Processed {row_count} rows")
-            
-    except Exception as e:
-        print(f"Error opening file: {e}")
-        return {}
-    
-    return category_announcements
+        for category, *fields in _iter_category_items(category_announcements):
+            handle = handles.get(category)
+            if handle is None:
+                path = os.path.join(spill_dir, f"{len(handles)}.txt")
+                handle = handles[category] = open(path, 'w', encoding='utf-8')
+            handle.write(_format_announcement(*fields))
+            counts[category] += 1
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return counts, {category: handle.name for category, handle in handles.items()}
+
+def _write_category_listings(out, counts, paths):
+    """Write the category listings from the spill files, largest category first"""
+    for category, count in counts.most_common():
+        out.write(f"\n{category} ({count} announcements):\n")
+        out.write("=" * (len(category) + 20) + "\n")
+        with open(paths[category], 'r', encoding='utf-8') as spill:
+            shutil.copyfileobj(spill, out)
+        out.write("\n" + "-"*80 + "\n")
 
 def print_category_details(category_announcements):
     """Print detailed information for each category"""
-    if not category_announcements:
-        print("No announcements to display")
-        return
-        
-    print("\nDetailed Category Listings:")
-    print("=========================")
-    
-    # Sort categories by number of announcements
-    sorted_categories = sorted(
-        category_announcements.items(),
-        key=lambda x: len(x[1]),
-        reverse=True
-    )
-    
-    for category, announcements in sorted_categories:
-        if len(announcements) > 0:
-            print(f"\n{category} ({len(announcements)} announcements):")
-            print("=" * (len(category) + 20))
-            
-            for ann in announcements:
-                print(f"\nCompany: {ann['company']}")
-                print(f"Announcement: {ann['headline']}")
-                if ann['description']:
-                    print(f"Details: {ann['description'][:200]}...")
+    with tempfile.TemporaryDirectory() as spill_dir:
+        counts, paths = _spill_by_category(category_announcements, spill_dir)
+        if not counts:
+            print("No announcements to display")
+            return counts
+
+        print("\nDetailed Category Listings:")
+        print("=========================")
+        _write_category_listings(sys.stdout, counts, paths)
+    return counts
 
 def save_category_details(category_announcements, output_file):
-    """Save detailed information for each category to a file"""
-    if not category_announcements:
-        return
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("BSE Announcements Classification Report\n")
-        f.write("====================================\n\n")
-        
-        # Sort categories by number of announcements
-        sorted_categories = sorted(
-            category_announcements.items(),
-            key=lambda x: len(x[1]),
-            reverse=True
-        )
-        
-        # Write summary
-        f.write("Summary of Classifications:\n")
-        f.write("-------------------------\n")
-        for category, announcements in sorted_categories:
-            f.write(f"{category}: {len(announcements)} announcements\n")
-        f.write("\n\n")
-        
-        # Write detailed listings
-        f.write("Detailed Category Listings:\n")
-        f.write("=========================\n")
-        
-        for category, announcements in sorted_categories:
-            if len(announcements) > 0:
-                f.write(f"\n{category} ({len(announcements)} announcements):\n")
-                f.write("=" * (len(category) + 20) + "\n")
-                
-                for ann in announcements:
-                    f.write(f"\nCompany: {ann['company']}\n")
-                    f.write(f"Announcement: {ann['headline']}\n")
-                    if ann['description']:
-                        f.write(f"Details: {ann['description'][:200]}...\n")
-                f.write("\n" + "-"*80 + "\n")
-    
+    """
+    Save detailed information for each category to a file.
+    Accepts the stream from process_announcements (or a category mapping) and returns the category counts.
+    """
+    with tempfile.TemporaryDirectory() as spill_dir:
+        counts, paths = _spill_by_category(category_announcements, spill_dir)
+        if not counts:
+            return counts
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write("BSE Announcements Classification Report\n")
+            f.write("====================================\n\n")
+
+            # Write summary, sorted by number of announcements
+            f.write("Summary of Classifications:\n")
+            f.write("-------------------------\n")
+            for category, count in counts.most_common():
+                f.write(f"{category}: {count} announcements\n")
+            f.write("\n\n")
+
+            # Write detailed listings
+            f.write("Detailed Category Listings:\n")
+            f.write("=========================\n")
+            _write_category_listings(f, counts, paths)
+
     print(f"\nClassification results have been saved to: {output_file}")
+    return counts
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("Running BSE announcements classification...")
-    
+
     # Use the correct file path
     file_path = os.path.abspath("Jan22_bse_announcements.csv")
     output_file = "bse_announcements_classification.txt"
-    
+
     print(f"Looking for file: {file_path}")
-    
-    category_announcements = process_announcements(file_path)
-    print_category_details(category_announcements)
-    save_category_details(category_announcements, output_file)
+
+    # Use the extracted attachment text when the PDFs are stored locally (see attachments.py)
+    from attachments import ATTACHMENT_DIR, AttachmentTextStore
+    attachments = AttachmentTextStore() if os.path.isdir(ATTACHMENT_DIR) else None
+
+    counts = save_category_details(process_announcements(file_path, attachments), output_file)
+    if attachments is not None:
+        # Rows whose PDFs were not cached yet were classified without their text; finish
+        # extracting them so the next run has it (or run attachments.py first)
+        attachments.close(wait_for_pending=True)
+
+    print("\nSummary of Classifications:")
+    print("-------------------------")
+    for category, count in counts.most_common():
+        print(f"{category}: {count} announcements")
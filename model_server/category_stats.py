@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Union
+
+UNCATEGORIZED = 'Uncategorized'
+
+# Announcement fields kept per row, keyed by the names used in the category reports
+ANNOUNCEMENT_COLUMNS = {
+    'company': 'COMPANY_NAME',
+    'headline': 'HEADLINE',
+    'description': 'DESCRIPTION_1',
+    'date': 'DT',
+    'announcement_type': 'ANNOUNCEMENT_TYPE',
+}
+
+# Low-cardinality columns held as categoricals: one code per row instead of one string object
+CATEGORICAL_COLUMNS = ['CATEGORY', 'COMPANY_NAME', 'ANNOUNCEMENT_TYPE']
+
+
+def as_category(values, missing: str = UNCATEGORIZED) -> pd.Series:
+    """Categorical copy of a column with missing values mapped to `missing`"""
+    series = pd.Series(values).astype('category')
+    if series.isna().any():
+        series = series.cat.add_categories([missing]).fillna(missing)
+    return series
+
+
+def read_announcements(file_paths: Union[str, Iterable[str]], columns: List[str]) -> pd.DataFrame:
+    """
+    Read only `columns` from one or more announcement CSVs (e.g. a month of daily files).
+    Low-cardinality columns are read as categoricals, and the categories are merged across files.
+    """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    dtypes = {column: 'category' for column in CATEGORICAL_COLUMNS if column in columns}
+    frames = [pd.read_csv(path, usecols=columns, dtype=dtypes) for path in file_paths]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    # concat falls back to object dtype when the files have different category sets
+    for column in dtypes:
+        if df[column].dtype != 'category':
+            df[column] = df[column].astype('category')
+    return df
+
+
+def category_summary(categories: pd.Series) -> Dict:
+    """
+    Count and percentage per category, largest first with ties in order of first appearance.
+    Missing values count toward the total only.
+    """
+    total = len(categories)
+    codes, uniques = pd.factorize(categories)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    order = np.argsort(-counts, kind='stable')
+    return {
+        'total_announcements': total,
+        'categories': {
+            uniques[i]: {'count': int(counts[i]), 'percentage': round(int(counts[i]) / total * 100, 2)}
+            for i in order
+        }
+    }
+
+
+def group_by_category(df: pd.DataFrame, category_column: str) -> Dict[str, pd.DataFrame]:
+    """One frame per category, largest category first"""
+    categories = as_category(df[category_column])
+    groups = dict(iter(df.drop(columns=[category_column]).groupby(categories, observed=True, sort=False)))
+    return dict(sorted(groups.items(), key=lambda item: len(item[1]), reverse=True))
+
+
+def announcement_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename the raw columns to the report field names, with empty text for missing optional fields"""
+    frame = df.rename(columns={column: field for field, column in ANNOUNCEMENT_COLUMNS.items()})
+    for field in ('description', 'announcement_type'):
+        column = frame[field]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            if '' not in column.cat.categories:
+                column = column.cat.add_categories([''])
+        frame[field] = column.fillna('')
+    return frame
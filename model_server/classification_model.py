@@ -2,22 +2,18 @@ from typing import List, Dict
 import numpy as np
 from collections import Counter
 import re
+from rules import get_rule_store
 
 class TextClassifier:
-    def __init__(self):
+    def __init__(self, rule_store=None):
         print("Initializing stock market sentiment classifier...")
-        # Define stock market sentiment keywords
-        self.sentiment_words = {
-            'bullish': {'surge', 'rally', 'breakout', 'upgrade', 'outperform', 'buy', 'strong', 'growth',
-                       'profit', 'upside', 'gain', 'positive', 'rise', 'higher', 'momentum', 'beat',
-                       'exceed', 'improve', 'recovery', 'opportunity'},
-            'bearish': {'decline', 'downgrade', 'sell', 'underperform', 'weak', 'loss', 'downside',
-                       'fall', 'lower', 'drop', 'crash', 'risk', 'concern', 'warning', 'miss',
-                       'below', 'pressure', 'volatile', 'caution', 'debt'},
-            'neutral': {'hold', 'stable', 'steady', 'flat', 'unchanged', 'mixed', 'balanced',
-                       'maintain', 'inline', 'expected', 'moderate', 'consolidate', 'range-bound',
-                       'fair', 'normal'}
-        }
+        # Stock market sentiment keywords come from the versioned rules file
+        self.rule_store = rule_store or get_rule_store()
+
+    @property
+    def sentiment_words(self):
+        """Sentiment word sets of the current rules version"""
+        return self.rule_store.current.sentiment.words
         
     def _preprocess(self, text: str) -> List[str]:
         """Basic text preprocessing"""
@@ -28,24 +24,32 @@ class TextClassifier:
         # Remove empty strings
         return [word for word in words if word]
         
-    def _calculate_sentiment_score(self, words: List[str], sentiment: str) -> float:
+    def _calculate_sentiment_score(self, words: List[str], sentiment: str, lexicon=None) -> float:
         """Calculate sentiment score based on keyword matches"""
-        sentiment_words = self.sentiment_words.get(sentiment, set())
+        lexicon = lexicon if lexicon is not None else self.sentiment_words
+        sentiment_words = lexicon.get(sentiment, set())
         matches = sum(1 for word in words if word in sentiment_words)
         return matches + 0.1  # Add small constant to avoid zero probabilities
         
-    def predict_proba(self, text: str, labels: List[str]) -> Dict[str, float]:
+    def predict_proba(self, text: str, labels: List[str], lexicon=None) -> Dict[str, float]:
         """
         Predict probability scores for each label using sentiment analysis
         """
-        words = self._preprocess(text)
-        
+        return self.predict_proba_words(self._preprocess(text), labels, lexicon)
+
+    def predict_proba_words(self, words: List[str], labels: List[str], lexicon=None) -> Dict[str, float]:
+        """
+        Predict probability scores from already preprocessed words
+        """
+        # One rules version for the whole prediction
+        lexicon = lexicon if lexicon is not None else self.sentiment_words
+
         # Calculate sentiment scores
         scores = []
         for label in labels:
             # If label is in our sentiment dictionary, use sentiment scoring
-            if label.lower() in self.sentiment_words:
-                score = self._calculate_sentiment_score(words, label.lower())
+            if label.lower() in lexicon:
+                score = self._calculate_sentiment_score(words, label.lower(), lexicon)
             else:
                 # For unknown labels, use a small constant
                 score = 0.1
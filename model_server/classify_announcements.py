@@ -1,38 +1,28 @@
-import pandas as pd
-import json
-from collections import defaultdict
+import argparse
+from category_stats import (ANNOUNCEMENT_COLUMNS, announcement_frame, as_category, category_summary,
+                            group_by_category, read_announcements)
+from bse_classification import save_category_details
 
-def classify_announcements(input_file):
+def classify_announcements(input_files):
     """
-    Classify BSE announcements based on their categories and generate detailed statistics
+    Classify BSE announcements based on their categories and generate detailed statistics.
+    Accepts one CSV or a list of CSVs; returns {category: DataFrame of announcements}, largest first.
     """
-    # Read the CSV file
-    df = pd.read_csv(input_file)
-    
-    # Create a dictionary to store announcements by category
-    category_announcements = defaultdict(list)
-    
-    # Process each row
-    for _, row in df.iterrows():
-        announcement = {
-            'company': row['COMPANY_NAME'],
-            'headline': row['HEADLINE'],
-            'description': row['DESCRIPTION_1'] if pd.notna(row['DESCRIPTION_1']) else '',
-            'date': row['DT'],
-            'announcement_type': row['ANNOUNCEMENT_TYPE'] if pd.notna(row['ANNOUNCEMENT_TYPE']) else ''
-        }
-        
-        # Add to appropriate category
-        category = row['CATEGORY'] if pd.notna(row['CATEGORY']) else 'Uncategorized'
-        category_announcements[category].append(announcement)
-    
-    return category_announcements
+    # Only the needed columns are read, with categorical dtypes, and grouped in one vectorized pass
+    df = read_announcements(input_files, list(ANNOUNCEMENT_COLUMNS.values()) + ['CATEGORY'])
+    return group_by_category(announcement_frame(df), 'CATEGORY')
+
+def summarize_announcements(input_files):
+    """Category counts and percentages, reading only the CATEGORY column"""
+    df = read_announcements(input_files, ['CATEGORY'])
+    # Missing categories are counted as Uncategorized, the same as in the full listing
+    return category_summary(as_category(df['CATEGORY']))
 
 def print_classification_summary(category_announcements):
     """Print a summary of the classification results"""
     print("\nBSE Announcements Classification Summary:")
     print("======================================")
-    
+
     # Sort categories by number of announcements
     sorted_categories = sorted(
         category_announcements.items(),
@@ -40,25 +30,35 @@ def print_classification_summary(category_announcements):
         reverse=True
     # Descending order by number of announcements
     )
-    
+
     # Print summary
     for category, announcements in sorted_categories:
         print(f"{category}: {len(announcements)} announcements")
 
 def main():
-    input_file = "Jan22_bse_announcements_classified.csv"
-    
+    parser = argparse.ArgumentParser(description="Group classified BSE announcements by category")
+    parser.add_argument("input_files", nargs="*", default=["Jan22_bse_announcements_classified.csv"])
+    parser.add_argument("--output", default="bse_classification_results.txt")
+    parser.add_argument("--summary-only", action="store_true", help="Only count categories; skip the listings")
+    args = parser.parse_args()
+
     try:
+        if args.summary_only:
+            stats = summarize_announcements(args.input_files)
+            print(f"\n{stats['total_announcements']} announcements")
+            for category, info in stats['categories'].items():
+                print(f"{category}: {info['count']} announcements ({info['percentage']}%)")
+            return
+
         # Classify announcements
-        category_announcements = classify_announcements(input_file)
-        
+        category_announcements = classify_announcements(args.input_files)
+
         # Print classification summary
         print_classification_summary(category_announcements)
-        
+
         # Save detailed results
-        output_file = "bse_classification_results.txt"
-        save_category_details(category_announcements, output_file)
-        
+        save_category_details(category_announcements, args.output)
+
     except Exception as e:
         print(f"Error processing announcements: {str(e)}")
 
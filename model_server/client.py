@@ -0,0 +1,290 @@
+"""
+Python client for the NLP API.
+
+AsyncNLPClient keeps one pooled keep-alive connection set to the server. It coalesces
+concurrent predict / classify / analyze calls into the batch endpoints: calls with the
+same labels and settings are held for up to `max_wait_ms` (or until `max_batch_size`
+accumulate) and sent as one /predict/batch, /classify/batch or /analyze/batch request.
+At most `max_concurrency` requests are in flight. 429 and 503 responses and connection
+errors are retried with exponential backoff, honouring Retry-After.
+
+NLPClient is the synchronous equivalent. It runs an AsyncNLPClient on a background event
+loop, so calls from many threads are coalesced too.
+
+Examples:
+    async with AsyncNLPClient("http://127.0.0.1:8000") as client:
+        entities = await client.predict("MRF Ltd shares fell 3%", ["Company"])
+        async for entities in client.iter_predict(headlines, ["Company", "Person"]):
+            ...
+
+    with NLPClient("http://127.0.0.1:8000") as client:
+        scores = client.classify("Strong Q3 earnings", ["bullish", "bearish", "neutral"])
+"""
+import asyncio
+import random
+import threading
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+
+RETRY_STATUSES = {429, 503}
+
+
+class NLPClientError(Exception):
+    """Request failed with a non-retryable status, or retries were exhausted"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _Coalescer:
+    """
+    Collects single-text calls that share a key and sends them as one batch request.
+    A batch is sent when it reaches max_batch_size or max_wait_ms after its first call.
+    """
+
+    def __init__(self, send: Callable, max_batch_size: int, max_wait_ms: float):
+        self._send = send
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: Dict[tuple, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[tuple, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    def submit(self, key: tuple, text: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((text, future))
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.max_wait_ms / 1000, self._flush, key)
+        return future
+
+    def _flush(self, key: tuple):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.create_task(self._run(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: tuple, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            results = await self._send(key, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def drain(self):
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class AsyncNLPClient:
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, max_concurrency: int = 8, max_retries: int = 5,
+                 backoff_s: float = 0.25, timeout_s: float = 60.0, priority: Optional[str] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        # None: single calls go to the interactive lane and bulk helpers to the bulk lane
+        self.priority = priority
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout_s,
+            transport=transport,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._predict = _Coalescer(self._send_predict, max_batch_size, max_wait_ms)
+        self._classify = _Coalescer(self._send_classify, max_batch_size, max_wait_ms)
+        self._analyze = _Coalescer(self._send_analyze, max_batch_size, max_wait_ms)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        for coalescer in (self._predict, self._classify, self._analyze):
+            await coalescer.drain()
+        await self._http.aclose()
+
+    async def _post(self, path: str, payload: Dict) -> Dict:
+        """POST with bounded concurrency and retries on 429/503 and connection errors"""
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff_s * 2 ** attempt * (0.5 + random.random())
+            async with self._slots:
+                try:
+                    response = await self._http.post(path, json=payload)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise NLPClientError(0, str(e)) from e
+                    response = None
+            if response is not None:
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise NLPClientError(response.status_code, response.text)
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.replace(".", "", 1).isdigit():
+                    delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
+
+    # Batch senders; key layouts match the submit() calls below
+    async def _send_predict(self, key: tuple, texts: List[str]) -> List[List[Dict]]:
+        labels, threshold, model, company_gazetteer, priority = key
+        payload = {"texts": texts, "labels": list(labels), "threshold": threshold, "model": model,
+                   "company_gazetteer": company_gazetteer, "priority": priority}
+        return [result["entities"] for result in (await self._post("/predict/batch", payload))["results"]]
+
+    async def _send_classify(self, key: tuple, texts: List[str]) -> List[Dict[str, float]]:
+        (labels,) = key
+        payload = {"texts": texts, "labels": list(labels)}
+        return [result["scores"] for result in (await self._post("/classify/batch", payload))["results"]]
+
+    async def _send_analyze(self, key: tuple, texts: List[str]) -> List[Dict]:
+        labels, sentiment_labels, threshold, model, priority = key
+        payload = {"texts": texts, "labels": list(labels), "sentiment_labels": list(sentiment_labels),
+                   "threshold": threshold, "model": model, "priority": priority}
+        return (await self._post("/analyze/batch", payload))["results"]
+
+    def _predict_key(self, labels, threshold, model, company_gazetteer, default_priority):
+        """The client's priority, when set, wins over the per-call default (as in analyze)"""
+        return tuple(labels), threshold, model, company_gazetteer, self.priority or default_priority
+
+    # Single-text calls, coalesced into batch requests
+    async def predict(self, text: str, labels: List[str], threshold: float = 0.5, model: Optional[str] = None,
+                      company_gazetteer: Optional[str] = None) -> List[Dict]:
+        key = self._predict_key(labels, threshold, model, company_gazetteer, "interactive")
+        return await self._predict.submit(key, text)
+
+    async def classify(self, text: str, labels: List[str]) -> Dict[str, float]:
+        return await self._classify.submit((tuple(labels),), text)
+
+    async def analyze(self, text: str, labels: List[str], sentiment_labels: Iterable[str] = ("bullish", "bearish", "neutral"),
+                      threshold: float = 0.5, model: Optional[str] = None) -> Dict:
+        key = (tuple(labels), tuple(sentiment_labels), threshold, model, self.priority or "interactive")
+        return await self._analyze.submit(key, text)
+
+    # Bulk helpers: chunked batch requests, results in input order
+    async def iter_predict(self, texts: Iterable[str], labels: List[str], threshold: float = 0.5,
+                           model: Optional[str] = None, company_gazetteer: Optional[str] = None) -> AsyncIterator[List[Dict]]:
+        """Entities per text, in input order, with up to max_concurrency chunks in flight"""
+        key = self._predict_key(labels, threshold, model, company_gazetteer, "bulk")
+        async for result in self._iter_chunks(texts, lambda chunk: self._send_predict(key, chunk)):
+            yield result
+
+    async def iter_classify(self, texts: Iterable[str], labels: List[str]) -> AsyncIterator[Dict[str, float]]:
+        async for result in self._iter_chunks(texts, lambda chunk: self._send_classify((tuple(labels),), chunk)):
+            yield result
+
+    async def predict_many(self, texts: Iterable[str], labels: List[str], **kwargs) -> List[List[Dict]]:
+        return [result async for result in self.iter_predict(texts, labels, **kwargs)]
+
+    async def classify_many(self, texts: Iterable[str], labels: List[str]) -> List[Dict[str, float]]:
+        return [result async for result in self.iter_classify(texts, labels)]
+
+    async def _iter_chunks(self, texts: Iterable[str], send: Callable) -> AsyncIterator:
+        """
+        Read the input lazily in chunks of max_batch_size and keep a window of requests in
+        flight. Memory is bounded by the window, not by the size of the input.
+        """
+        window = deque()
+        chunk = []
+        try:
+            for text in texts:
+                chunk.append(text)
+                if len(chunk) == self.max_batch_size:
+                    window.append(asyncio.ensure_future(send(chunk)))
+                    chunk = []
+                    while len(window) >= self.max_concurrency:
+                        for result in await window.popleft():
+                            yield result
+            if chunk:
+                window.append(asyncio.ensure_future(send(chunk)))
+            while window:
+                for result in await window.popleft():
+                    yield result
+        finally:
+            # Stopped early (consumer broke out or a chunk failed): drop the requests still in flight
+            for future in window:
+                future.cancel()
+
+
+class NLPClient:
+    """Synchronous client; same methods as AsyncNLPClient, backed by it on a private event loop"""
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="nlp-client", daemon=True)
+        self._thread.start()
+        self._client: AsyncNLPClient = self._call(self._create(base_url, kwargs))
+
+    @staticmethod
+    async def _create(base_url, kwargs):
+        # Built on the background loop so its semaphore and timers belong to that loop
+        return AsyncNLPClient(base_url, **kwargs)
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._call(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def predict(self, text: str, labels: List[str], **kwargs) -> List[Dict]:
+        return self._call(self._client.predict(text, labels, **kwargs))
+
+    def classify(self, text: str, labels: List[str]) -> Dict[str, float]:
+        return self._call(self._client.classify(text, labels))
+
+    def analyze(self, text: str, labels: List[str], **kwargs) -> Dict:
+        return self._call(self._client.analyze(text, labels, **kwargs))
+
+    def predict_many(self, texts: Iterable[str], labels: List[str], **kwargs) -> List[List[Dict]]:
+        return self._call(self._client.predict_many(texts, labels, **kwargs))
+
+    def classify_many(self, texts: Iterable[str], labels: List[str]) -> List[Dict[str, float]]:
+        return self._call(self._client.classify_many(texts, labels))
+
+    def iter_predict(self, texts: Iterable[str], labels: List[str], **kwargs) -> Iterator[List[Dict]]:
+        return self._iterate(self._client.iter_predict(texts, labels, **kwargs))
+
+    def iter_classify(self, texts: Iterable[str], labels: List[str]) -> Iterator[Dict[str, float]]:
+        return self._iterate(self._client.iter_classify(texts, labels))
+
+    def _iterate(self, iterator: AsyncIterator) -> Iterator:
+        try:
+            while True:
+                try:
+                    yield self._call(iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._call(iterator.aclose())
@@ -0,0 +1,274 @@
+"""
+Incremental per-company announcement aggregates.
+
+Every classified announcement updates a per-company, per-day row of counters keyed by
+SCRIP_CD: the announcement count, the sum of each sentiment score, and one count per
+announcement category. Rows live in one numpy array of shape
+(companies, max_days + 1, columns) and hold running totals rather than daily values. A day
+slot is a ring buffer slot, so "last N days" is one subtraction of two slots, whatever the
+history length. Announcements arriving out of order (an older day) update the later slots,
+which is bounded by max_days.
+
+Build the aggregates from historical files once, then keep them current from /analyze:
+    python company_stats.py Jan22_bse_announcements.csv --output company_stats.npz
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+COMPANY_STATS_PATH = os.environ.get(
+    "COMPANY_STATS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "company_stats.npz"))
+
+SENTIMENT_LABELS = ["bullish", "bearish", "neutral"]
+
+# Fixed leading columns; category columns are appended as new categories are seen
+COUNT, SCORED = 0, 1
+
+
+def day_number(value: Union[date, datetime, str]) -> int:
+    """Proleptic ordinal of a date, datetime or ISO date string ("2025-01-22 12:13:21.28" works too)"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value.strip()[:10])
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+class CompanyAggregates:
+    """Rolling per-company, per-day sentiment sums and category counts"""
+
+    def __init__(self, max_days: int = 90, sentiment_labels: Iterable[str] = SENTIMENT_LABELS,
+                 initial_capacity: int = 1024):
+        self.max_days = max_days
+        self.sentiment_labels = list(sentiment_labels)
+        self.categories: List[str] = []
+        self.companies: List[str] = []           # SCRIP_CD per row
+        self.names: List[str] = []                # company name per row, when known
+        self.latest_day: Optional[int] = None     # most recent day seen; windows end here
+        self.dropped = 0                          # announcements older than the retained window
+        self.updates = 0                          # add() calls since startup; tells savers what changed
+        self._slots = max_days + 1
+        self._rows: Dict[str, int] = {}
+        self._category_columns: Dict[str, int] = {}
+        self._totals = np.zeros((initial_capacity, self._slots, 2 + len(self.sentiment_labels)))
+        self._last_day = np.full(initial_capacity, -1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.companies)
+
+    def _row(self, scrip_cd: str, company_name: str) -> int:
+        row = self._rows.get(scrip_cd)
+        if row is None:
+            row = self._rows[scrip_cd] = len(self.companies)
+            self.companies.append(scrip_cd)
+            self.names.append(company_name)
+            if row == len(self._last_day):
+                self._totals = np.concatenate([self._totals, np.zeros_like(self._totals)])
+                self._last_day = np.concatenate([self._last_day, np.full(row, -1, dtype=np.int64)])
+        elif company_name and not self.names[row]:
+            self.names[row] = company_name
+        return row
+
+    def _category_column(self, category: str) -> int:
+        column = self._category_columns.get(category)
+        if column is None:
+            column = self._category_columns[category] = self._totals.shape[2]
+            self.categories.append(category)
+            self._totals = np.concatenate([self._totals, np.zeros(self._totals.shape[:2] + (1,))], axis=2)
+        return column
+
+    def add(self, scrip_cd: str, day: Union[date, datetime, str, int], category: Optional[str] = None,
+            scores: Optional[Dict[str, float]] = None, company_name: str = ""):
+        """
+        Record one classified announcement. Sentiment is recorded only when `scores` has every
+        configured label, so the average is not skewed by requests that used other labels.
+        """
+        scrip_cd = str(scrip_cd).strip()
+        if not scrip_cd:
+            return
+        day = day if isinstance(day, int) else day_number(day)
+        with self._lock:
+            self.updates += 1
+            row = self._row(scrip_cd, company_name)
+            column = self._category_column(category) if category is not None else None
+            values = np.zeros(self._totals.shape[2])
+            values[COUNT] = 1
+            if column is not None:
+                values[column] = 1
+            if scores and all(label in scores for label in self.sentiment_labels):
+                values[SCORED] = 1
+                values[2:2 + len(self.sentiment_labels)] = [scores[label] for label in self.sentiment_labels]
+
+            totals = self._totals[row]
+            last = self._last_day[row]
+            if last < 0:
+                last = self._last_day[row] = day
+            if day > last:
+                # Carry the running totals forward over the days without announcements
+                carried = totals[last % self._slots].copy()
+                for missed in range(max(last + 1, day - self.max_days), day + 1):
+                    totals[missed % self._slots] = carried
+                self._last_day[row] = last = day
+            elif day < last - self.max_days:
+                self.dropped += 1
+                return
+            # The day's slot and every later retained slot include the new announcement
+            for later in range(day, last + 1):
+                totals[later % self._slots] += values
+            if self.latest_day is None or day > self.latest_day:
+                self.latest_day = day
+
+    def _window(self, rows: np.ndarray, days: int) -> np.ndarray:
+        """Totals over the last `days` days (ending at latest_day) for each row"""
+        if not 1 <= days <= self.max_days:
+            raise ValueError(f"days must be between 1 and {self.max_days}")
+        last = self._last_day[rows]
+        start = self.latest_day - days
+        # Running totals stay flat after a company's last announcement
+        end_totals = self._totals[rows, last % self._slots]
+        start_totals = self._totals[rows, np.minimum(start, last) % self._slots]
+        return np.where((start < last)[:, None], end_totals - start_totals, 0.0)
+
+    def _summary(self, row: int, totals: np.ndarray, days: int) -> Dict:
+        scored = totals[SCORED]
+        categories = {
+            category: int(totals[column])
+            for category, column in sorted(self._category_columns.items(), key=lambda item: -totals[item[1]])
+            if totals[column]
+        }
+        return {
+            "scrip_cd": self.companies[row],
+            "company": self.names[row],
+            "days": days,
+            "announcements": int(totals[COUNT]),
+            "sentiment": {
+                label: (float(totals[2 + i] / scored) if scored else None)
+                for i, label in enumerate(self.sentiment_labels)
+            },
+            "categories": categories,
+        }
+
+    def query(self, scrip_cd: str, days: int = 7) -> Optional[Dict]:
+        """Announcement count, mean sentiment and category counts of one company over the last `days` days"""
+        with self._lock:
+            row = self._rows.get(str(scrip_cd).strip())
+            if row is None:
+                return None
+            totals = self._window(np.array([row]), days)[0]
+            return self._summary(row, totals, days)
+
+    def top(self, days: int = 7, sort_by: str = "announcements", limit: int = 20) -> List[Dict]:
+        """
+        Companies with the most announcements (sort_by="announcements") or the highest mean
+        sentiment score for a label (e.g. sort_by="bearish") over the last `days` days
+        """
+        with self._lock:
+            if not self.companies:
+                return []
+            rows = np.arange(len(self.companies))
+            totals = self._window(rows, days)
+            if sort_by == "announcements":
+                key = totals[:, COUNT]
+            elif sort_by in self.sentiment_labels:
+                scored = totals[:, SCORED]
+                key = np.divide(totals[:, 2 + self.sentiment_labels.index(sort_by)], scored,
+                                out=np.full(len(rows), -np.inf), where=scored > 0)
+            else:
+                raise ValueError(f"sort_by must be announcements or one of: {', '.join(self.sentiment_labels)}")
+            order = [row for row in np.argsort(-key, kind="stable")[:limit] if totals[row, COUNT] > 0]
+            return [self._summary(row, totals[row], days) for row in order]
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "companies": len(self.companies),
+                "categories": len(self.categories),
+                "max_days": self.max_days,
+                "latest_day": date.fromordinal(self.latest_day).isoformat() if self.latest_day is not None else None,
+                "dropped": self.dropped,
+                "memory_bytes": int(self._totals[:len(self.companies)].nbytes),
+            }
+
+    def save(self, path: str = COMPANY_STATS_PATH):
+        """Write the aggregates to an .npz file (atomically)"""
+        with self._lock:
+            meta = {
+                "max_days": self.max_days, "sentiment_labels": self.sentiment_labels,
+                "categories": self.categories, "companies": self.companies, "names": self.names,
+                "latest_day": self.latest_day, "dropped": self.dropped,
+            }
+            tmp_path = path + ".tmp.npz"
+            np.savez(tmp_path, totals=self._totals[:len(self.companies)],
+                     last_day=self._last_day[:len(self.companies)], meta=np.array(json.dumps(meta)))
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = COMPANY_STATS_PATH) -> "CompanyAggregates":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            aggregates = cls(meta["max_days"], meta["sentiment_labels"], initial_capacity=max(1, len(meta["companies"])))
+            count = len(meta["companies"])
+            aggregates._totals = np.zeros((max(1, count), aggregates._slots, data["totals"].shape[2]))
+            aggregates._totals[:count] = data["totals"]
+            aggregates._last_day[:count] = data["last_day"]
+        aggregates.categories = meta["categories"]
+        aggregates._category_columns = {
+            category: 2 + len(aggregates.sentiment_labels) + i for i, category in enumerate(meta["categories"])
+        }
+        aggregates.companies = meta["companies"]
+        aggregates.names = meta["names"]
+        aggregates._rows = {scrip_cd: row for row, scrip_cd in enumerate(aggregates.companies)}
+        aggregates.latest_day = meta["latest_day"]
+        aggregates.dropped = meta["dropped"]
+        return aggregates
+
+
+def aggregate_file(file_path: str, aggregates: CompanyAggregates, classifier=None, rules=None) -> int:
+    """Classify every announcement of a CSV and add it to the aggregates; returns the row count"""
+    from bse_classification import classify_announcement, iter_rows
+    from classification_model import TextClassifier
+    from rules import current_rules
+
+    rules = rules or current_rules()
+    classifier = classifier or TextClassifier()
+    columns = ["SCRIP_CD", "COMPANY_NAME", "DT", "HEADLINE", "DESCRIPTION_1", "DESCRIPTION_2"]
+    rows = 0
+    for scrip_cd, company_name, dt, headline, description1, description2 in iter_rows(file_path, columns):
+        try:
+            day = day_number(dt)
+        except ValueError:
+            continue
+        lowered = f"{headline} {description1} {description2}".lower()
+        scores = classifier.predict_proba(lowered, aggregates.sentiment_labels, rules.sentiment.words)
+        category = classify_announcement(lowered, rules=rules.bse_categories)
+        aggregates.add(scrip_cd, day, category, scores, company_name)
+        rows += 1
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per-company announcement aggregates from CSV files")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--output", default=COMPANY_STATS_PATH)
+    parser.add_argument("--max-days", type=int, default=90)
+    parser.add_argument("--append", action="store_true", help="Add to the existing aggregates in --output")
+    args = parser.parse_args()
+
+    if args.append and os.path.exists(args.output):
+        aggregates = CompanyAggregates.load(args.output)
+    else:
+        aggregates = CompanyAggregates(args.max_days)
+    for path in args.csv_files:
+        print(f"{path}: {aggregate_file(path, aggregates)} announcements")
+    aggregates.save(args.output)
+    print(f"Saved aggregates for {len(aggregates)} companies to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import re
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Exchange headlines look like "ASHOKA BUILDCON LTD. - 533271 - Announcement under ...".
+# The company/scrip prefix is the part that changes between otherwise identical filings.
+_COMPANY_PREFIX = re.compile(r'^.*? - \d{5,6} - ')
+_NON_WORD = re.compile(r'[^\w\s]+')
+_WHITESPACE = re.compile(r'\s+')
+
+# Universal hashing over 32-bit shingle hashes; a, b < 2**32 keeps a*h + b inside uint64
+_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize an announcement for fingerprinting (case, company prefix, punctuation)"""
+    text = str(text).lower().strip()
+    text = _COMPANY_PREFIX.sub('', text, count=1)
+    text = _NON_WORD.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick the LSH (bands, rows) split whose S-curve midpoint is closest to the threshold"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1.0 / bands) ** (1.0 / rows)
+        if best is None or abs(midpoint - threshold) < best[0]:
+            best = (abs(midpoint - threshold), bands, rows)
+    return best[1], best[2]
+
+
+class DedupStats:
+    """Counters describing how much work de-duplication saved"""
+
+    def __init__(self):
+        self.rows = 0
+        self.clusters = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.work_time_ms = 0.0
+        self.dedup_time_ms = 0.0   # normalizing, fingerprinting and index lookups
+
+    @property
+    def duplicates(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+    @property
+    def saved_fraction(self) -> float:
+        return self.duplicates / self.rows if self.rows else 0.0
+
+    @property
+    def skipped_time_ms(self) -> float:
+        """Estimated work skipped, assuming duplicates would have cost the average unique item"""
+        if not self.clusters:
+            return 0.0
+        return self.work_time_ms / self.clusters * self.duplicates
+
+    @property
+    def saved_time_ms(self) -> float:
+        """Net time saved: skipped work minus the cost of de-duplication itself (negative when it cost more)"""
+        return self.skipped_time_ms - self.dedup_time_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            'rows': self.rows,
+            'unique': self.clusters,
+            'exact_duplicates': self.exact_duplicates,
+            'near_duplicates': self.near_duplicates,
+            'work_saved_percentage': round(self.saved_fraction * 100, 2),
+            'work_time_ms': round(self.work_time_ms, 2),
+            'dedup_time_ms': round(self.dedup_time_ms, 2),
+            'estimated_time_skipped_ms': round(self.skipped_time_ms, 2),
+            'estimated_time_saved_ms': round(self.saved_time_ms, 2)
+        }
+
+    def summary(self) -> str:
+        return (f"De-duplication: {self.rows} rows -> {self.clusters} unique "
+                f"({self.exact_duplicates} exact, {self.near_duplicates} near duplicates); "
+                f"skipped {self.saved_fraction * 100:.1f}% of the work "
+                f"(~{self.skipped_time_ms:.2f} ms) at {self.dedup_time_ms:.2f} ms of de-duplication; "
+                f"net ~{self.saved_time_ms:.2f} ms saved")
+
+
+class Deduplicator:
+    """
+    Online near-duplicate detector.
+
+    Texts are first matched on a hash of their normalized form (exact duplicates), then
+    on MinHash signatures bucketed with LSH (near duplicates above `threshold` Jaccard
+    similarity of word shingles). With exact_only=True the raw text is used as the key,
+    which is what NER needs since entity offsets must stay valid for every member.
+    Near-duplicate matching computes a MinHash signature for every new text, which costs
+    more than cheap per-row work such as keyword rules; use exact_only=True in front of those.
+    max_clusters bounds the index for streaming use; texts seen after it fills up are
+    reported as new with cluster id -1, and nothing more is remembered (near-duplicate
+    variants of existing clusters included), so memory stays bounded.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, shingle_size: int = 3,
+                 exact_only: bool = False, seed: int = 1, max_clusters: Optional[int] = None):
+        self.max_clusters = max_clusters
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.exact_only = exact_only
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+        self._exact: Dict[str, int] = {}
+        self._buckets: List[Dict[bytes, List[int]]] = [dict() for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        self.stats = DedupStats()
+
+    @property
+    def _full(self) -> bool:
+        return self.max_clusters is not None and self.stats.clusters >= self.max_clusters
+
+    def _signature(self, normalized: str) -> np.ndarray:
+        """MinHash signature over word shingles"""
+        tokens = normalized.split()
+        size = self.shingle_size
+        if len(tokens) > size:
+            shingles = {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        else:
+            shingles = {' '.join(tokens)}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME & _MAX_HASH
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def assign(self, text: str) -> Tuple[int, bool]:
+        """Return (cluster_id, is_new) for a text, registering it as a new cluster if unseen"""
+        start_time = time.perf_counter()
+        try:
+            return self._assign(text)
+        finally:
+            self.stats.dedup_time_ms += (time.perf_counter() - start_time) * 1000
+
+    def _assign(self, text: str) -> Tuple[int, bool]:
+        self.stats.rows += 1
+        key = str(text) if self.exact_only else normalize_text(text)
+
+        cluster_id = self._exact.get(key)
+        if cluster_id is not None:
+            self.stats.exact_duplicates += 1
+            return cluster_id, False
+
+        signature = None
+        band_keys = []
+        if not self.exact_only:
+            signature = self._signature(key)
+            band_keys = self._band_keys(signature)
+            seen = set()
+            for band, band_key in enumerate(band_keys):
+                for candidate in self._buckets[band].get(band_key, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    similarity = float(np.mean(self._signatures[candidate] == signature))
+                    if similarity >= self.threshold:
+                        # Remember the variant for exact lookups only while the index has room
+                        if not self._full:
+                            self._exact[key] = candidate
+                        self.stats.near_duplicates += 1
+                        return candidate, False
+
+        if self._full:
+            self.stats.clusters += 1
+            return -1, True
+        cluster_id = self.stats.clusters
+        self.stats.clusters += 1
+        self._exact[key] = cluster_id
+        if signature is not None:
+            self._signatures.append(signature)
+            for band, band_key in enumerate(band_keys):
+                self._buckets[band].setdefault(band_key, []).append(cluster_id)
+        return cluster_id, True
+
+
+class DedupResult:
+    """Cluster assignment for a batch of texts"""
+
+    def __init__(self, labels: List[int], representatives: List[int], stats: DedupStats):
+        self.labels = labels                      # cluster id for every input
+        self.representatives = representatives    # input index of the first member of each cluster
+        self.stats = stats
+
+    def expand(self, cluster_results: Sequence) -> List:
+        """Copy one result per cluster back to every member"""
+        return [cluster_results[label] for label in self.labels]
+
+
+def deduplicate(texts: Sequence[str], **kwargs) -> DedupResult:
+    """Cluster a batch of texts into exact / near-duplicate groups"""
+    deduplicator = Deduplicator(**kwargs)
+    labels = []
+    representatives = []
+    for index, text in enumerate(texts):
+        cluster_id, is_new = deduplicator.assign(text)
+        if is_new:
+            representatives.append(index)
+        labels.append(cluster_id)
+    return DedupResult(labels, representatives, deduplicator.stats)
+
+
+def run_deduplicated(texts: Sequence[str], work_fn: Callable[[List[str]], Sequence],
+                     dedup: Optional[DedupResult] = None, **kwargs) -> Tuple[List, DedupStats]:
+    """
+    Run work_fn once per cluster and fan the results back out to every input.
+
+    work_fn receives the list of representative texts and must return one result per text.
+    Use exact_only=True for NER so copied entity offsets stay correct.
+    """
+    if dedup is None:
+        dedup = deduplicate(texts, **kwargs)
+    unique_texts = [texts[index] for index in dedup.representatives]
+
+    start_time = time.perf_counter()
+    unique_results = work_fn(unique_texts) if unique_texts else []
+    dedup.stats.work_time_ms += (time.perf_counter() - start_time) * 1000
+
+    return dedup.expand(unique_results), dedup.stats
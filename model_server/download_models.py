@@ -1,21 +1,195 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import argparse
+import json
 import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def download_model(model_path, model_name):
-    """Download a Hugging Face model and tokenizer to the specified directory"""
-    # Check if the directory already exists
-    if not os.path.exists(model_path):
-        # Create the directory
-        os.makedirs(model_path)
+from model_cache import (MANIFEST_PATH, hash_snapshot, load_manifest, lock_path, read_lock,
+                         verify_snapshot)
 
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
 
-    # Save the model and tokenizer to the specified directory
-    model.save_pretrained(model_path)
-    tokenizer.save_pretrained(model_path)
+_COMMIT = re.compile(r"^[0-9a-f]{40}$")
 
-# For this demo, download the English-French and French-English models
-download_model('models/en_fr/', 'Helsinki-NLP/opus-mt-en-fr')
-download_model('models/fr_en/', 'Helsinki-NLP/opus-mt-fr-en')
-# download_model('models/gliner_mediumv2.1/', 'urchade/gliner_mediumv2.1')
\ No newline at end of file
+
+def is_pinned(entry):
+    """A manifest entry is pinned by a commit hash revision or by sha256 checksums of its files"""
+    return bool(_COMMIT.match(entry.get("revision", "main")) or entry.get("sha256"))
+
+
+def pin_manifest(manifest_path, cache_dir, names):
+    """
+    Pin manifest entries to the commit and file checksums of their cached, verified snapshots.
+    Returns the names that were pinned.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    pinned = []
+    for entry in raw["models"]:
+        lock = read_lock(cache_dir, entry["name"])
+        if entry["name"] not in names or lock is None:
+            continue
+        # Hugging Face snapshot directories are named after the commit they contain
+        entry["revision"] = os.path.basename(lock["snapshot"])
+        entry["sha256"] = {name: meta["sha256"] for name, meta in sorted(lock["files"].items())}
+        _write_lock(cache_dir, entry, os.path.join(cache_dir, lock["snapshot"]), lock["files"])
+        pinned.append(entry["name"])
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(raw, f, indent=4)
+        f.write("\n")
+    os.replace(tmp_path, manifest_path)
+    return pinned
+
+
+def _repo_folder(repo_id):
+    """Directory name the Hugging Face cache uses for a model repo"""
+    return "models--" + repo_id.replace("/", "--")
+
+
+def _check_pins(entry, files):
+    """Compare downloaded files against sha256 values pinned in the manifest"""
+    mismatched = [name for name, expected in entry.get("sha256", {}).items()
+                  if files.get(name, {}).get("sha256") != expected]
+    if mismatched:
+        raise ValueError(f"checksum mismatch against manifest: {', '.join(mismatched)}")
+
+
+def _write_lock(cache_dir, entry, snapshot_dir, files):
+    lock = {
+        "name": entry["name"],
+        "repo_id": entry["repo_id"],
+        "revision": entry.get("revision", "main"),
+        "snapshot": os.path.relpath(snapshot_dir, cache_dir).replace(os.sep, "/"),
+        "files": files,
+    }
+    path = lock_path(cache_dir, entry["name"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(lock, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def _download(entry, cache_dir):
+    from huggingface_hub import snapshot_download
+    return snapshot_download(
+        repo_id=entry["repo_id"],
+        revision=entry.get("revision", "main"),
+        cache_dir=cache_dir,
+        allow_patterns=entry.get("allow_patterns"),
+    )
+
+
+def _copy_from_mirror(entry, cache_dir, mirror_dir):
+    """Copy a locked snapshot from a mirror with the same layout as the cache"""
+    mirror_lock = read_lock(mirror_dir, entry["name"])
+    if mirror_lock is None:
+        raise FileNotFoundError(f"{entry['name']} is not in mirror {mirror_dir}")
+    folder = _repo_folder(entry["repo_id"])
+    target = os.path.join(cache_dir, folder)
+    staging = target + ".partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.copytree(os.path.join(mirror_dir, folder), staging, symlinks=True)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return os.path.join(cache_dir, mirror_lock["snapshot"]), mirror_lock["files"]
+
+
+def fetch_model(entry, cache_dir, offline=False, mirror_dir=None, full_verify=False):
+    """Make one manifest entry present and valid in the cache. Returns (status, detail)."""
+    lock = read_lock(cache_dir, entry["name"])
+    if lock is not None and lock.get("revision") == entry.get("revision", "main"):
+        ok, problems = verify_snapshot(cache_dir, lock, full=full_verify)
+        if ok:
+            return "cached", lock["snapshot"]
+        print(f"{entry['name']}: cached copy invalid ({'; '.join(problems[:3])}), fetching again")
+
+    if offline:
+        snapshot_dir, expected_files = _copy_from_mirror(entry, cache_dir, mirror_dir)
+        files = hash_snapshot(snapshot_dir)
+        mismatched = [name for name, meta in expected_files.items()
+                      if files.get(name, {}).get("sha256") != meta["sha256"]]
+        if mismatched:
+            raise ValueError(f"checksum mismatch against mirror lock: {', '.join(mismatched)}")
+        status = "mirrored"
+    else:
+        snapshot_dir = _download(entry, cache_dir)
+        files = hash_snapshot(snapshot_dir)
+        status = "downloaded"
+
+    _check_pins(entry, files)
+    _write_lock(cache_dir, entry, snapshot_dir, files)
+    return status, os.path.relpath(snapshot_dir, cache_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch the models listed in the manifest into the local cache")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--jobs", type=int, default=4, help="Models downloaded concurrently")
+    parser.add_argument("--only", nargs="+", help="Fetch only these model names")
+    parser.add_argument("--required-only", action="store_true", help="Skip models marked required: false")
+    parser.add_argument("--verify", action="store_true", help="Re-hash cached files instead of checking sizes")
+    parser.add_argument("--offline", action="store_true", help="Never touch the network; copy from --mirror")
+    parser.add_argument("--mirror", default=os.environ.get("MODEL_MIRROR_DIR"),
+                        help="Local mirror directory with the same layout as the cache")
+    parser.add_argument("--require-pinned", action="store_true",
+                        help="Refuse manifest entries without a commit revision or sha256 checksums")
+    parser.add_argument("--pin", action="store_true",
+                        help="After fetching, pin the manifest entries to the fetched commit and checksums")
+    args = parser.parse_args()
+
+    if args.offline:
+        if not args.mirror:
+            parser.error("--offline needs --mirror (or MODEL_MIRROR_DIR)")
+        os.environ["HF_HUB_OFFLINE"] = "1"
+
+    manifest = load_manifest(args.manifest)
+    cache_dir = manifest["cache_dir"]
+    os.makedirs(cache_dir, exist_ok=True)
+
+    entries = manifest["models"]
+    if args.only:
+        entries = [entry for entry in entries if entry["name"] in args.only]
+    if args.required_only:
+        entries = [entry for entry in entries if entry.get("required", True)]
+
+    unpinned = [entry["name"] for entry in entries if not is_pinned(entry)]
+    if args.require_pinned and unpinned:
+        print(f"Unpinned models in {args.manifest}: {', '.join(unpinned)}")
+        print("Pin them with: python download_models.py --required-only --pin")
+        sys.exit(1)
+
+    print(f"Fetching {len(entries)} models into {cache_dir} ({args.jobs} at a time)")
+    start_time = time.perf_counter()
+    failed, failed_required = [], []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {
+            executor.submit(fetch_model, entry, cache_dir, args.offline, args.mirror, args.verify): entry
+            for entry in entries
+        }
+        for future in as_completed(futures):
+            entry = futures[future]
+            try:
+                status, detail = future.result()
+                print(f"{entry['name']}: {status} ({detail})")
+            except Exception as e:
+                print(f"{entry['name']}: failed ({e})")
+                failed.append(entry["name"])
+                if entry.get("required", True):
+                    failed_required.append(entry["name"])
+
+    print(f"Done in {time.perf_counter() - start_time:.1f}s")
+    if args.pin:
+        fetched = {entry["name"] for entry in entries} - set(failed)
+        pinned = pin_manifest(args.manifest, cache_dir, fetched)
+        print(f"Pinned {', '.join(pinned) or 'nothing'} in {args.manifest}")
+    if failed_required:
+        print(f"Required models failed: {', '.join(failed_required)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import json
+import re
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bse_classification import iter_rows
+
+_TOKEN = re.compile(r"\w+")
+
+# Legal-form suffixes dropped to build the short alias ("ELECON ENGINEERING CO.LTD." -> "elecon engineering")
+COMPANY_SUFFIXES = {"ltd", "limited", "pvt", "private", "co", "company", "inc", "corp", "corporation",
+                    "plc", "llp", "the"}
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Lower-cased word tokens with their character offsets"""
+    return [(m.group().lower(), m.start(), m.end()) for m in _TOKEN.finditer(text)]
+
+
+def company_aliases(name: str) -> List[Tuple[str, ...]]:
+    """Token sequences that refer to a listed company: the full name and the name without suffixes"""
+    tokens = tuple(token for token, _, _ in tokenize(name))
+    aliases = [tokens] if tokens else []
+    stripped = list(tokens)
+    while stripped and stripped[-1] in COMPANY_SUFFIXES:
+        stripped.pop()
+    while stripped and stripped[0] == "the":
+        stripped.pop(0)
+    if stripped and tuple(stripped) != tokens:
+        aliases.append(tuple(stripped))
+    return aliases
+
+
+class CompanyGazetteer:
+    """
+    Listed-company names compiled into a token-level Aho-Corasick automaton.
+    tag() finds every known company mention in one left-to-right pass over the tokens.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Longest alias ending at a node (own or via failure links): (length, company index)
+        self._output: List[Optional[Tuple[int, int]]] = [None]
+        self.companies: List[Tuple[str, str]] = []   # (scrip code, company name)
+        self._index: Dict[str, int] = {}
+        self._compiled = False
+
+    def __len__(self):
+        return len(self.companies)
+
+    def add(self, company_name: str, scrip_cd: str = ""):
+        name = " ".join(str(company_name).split())
+        if not name:
+            return
+        key = scrip_cd or name.lower()
+        if key in self._index:
+            company = self._index[key]
+        else:
+            company = self._index[key] = len(self.companies)
+            self.companies.append((scrip_cd, name))
+        for alias in company_aliases(name):
+            node = 0
+            for token in alias:
+                next_node = self._goto[node].get(token)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][token] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                node = next_node
+            if self._output[node] is None:
+                self._output[node] = (len(alias), company)
+        self._compiled = False
+
+    def compile(self):
+        """Build failure links (breadth-first) after all names are added"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(token, 0)
+                if self._output[child] is None:
+                    self._output[child] = self._output[self._fail[child]]
+        self._compiled = True
+        return self
+
+    def tag(self, text: str, label: str = "Company") -> List[Dict]:
+        """Leftmost-longest, non-overlapping company mentions as GLiNER-style entity dicts"""
+        if not self._compiled:
+            self.compile()
+        tokens = tokenize(text)
+        matches = []   # (start token, end token inclusive, company)
+        node = 0
+        for position, (token, _, _) in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            output = self._output[node]
+            if output is not None:
+                length, company = output
+                matches.append((position - length + 1, position, company))
+
+        entities = []
+        last_end = -1
+        # Longest match per start position wins, then scan left to right without overlaps
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        for start, end, company in matches:
+            if start <= last_end:
+                continue
+            begin, finish = tokens[start][1], tokens[end][2]
+            # A one-word alias only counts when written as a name (e.g. "MRF", "Infosys")
+            if start == end and not text[begin].isupper():
+                continue
+            scrip_cd, name = self.companies[company]
+            entities.append({"text": text[begin:finish], "label": label, "start": begin, "end": finish,
+                             "score": 1.0, "company_name": name, "scrip_cd": scrip_cd})
+            last_end = end
+        return entities
+
+    @classmethod
+    def from_csv(cls, file_paths: Iterable[str]) -> "CompanyGazetteer":
+        """Build from the COMPANY_NAME and SCRIP_CD columns of announcement CSVs"""
+        gazetteer = cls()
+        for file_path in file_paths:
+            for company_name, scrip_cd in iter_rows(file_path, ["COMPANY_NAME", "SCRIP_CD"]):
+                gazetteer.add(company_name, scrip_cd.strip())
+        return gazetteer.compile()
+
+
+def merge_entities(model_entities: List[Dict], gazetteer_entities: List[Dict]) -> List[Dict]:
+    """Gazetteer hits take precedence; model entities overlapping them are dropped"""
+    merged = list(gazetteer_entities)
+    for entity in model_entities:
+        if not any(entity["start"] < hit["end"] and hit["start"] < entity["end"] for hit in gazetteer_entities):
+            merged.append(entity)
+    merged.sort(key=lambda entity: entity["start"])
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tag listed-company mentions in announcements with the gazetteer")
+    parser.add_argument("sources", nargs="+", help="Announcement CSVs providing COMPANY_NAME and SCRIP_CD")
+    parser.add_argument("--tag", required=True, help="Announcements CSV to tag")
+    parser.add_argument("--columns", nargs="+", default=["HEADLINE", "DESCRIPTION_1"], help="Text columns to tag")
+    parser.add_argument("--output", default="company_tags.jsonl")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    gazetteer = CompanyGazetteer.from_csv(args.sources)
+    print(f"Built gazetteer with {len(gazetteer)} companies in {time.perf_counter() - start_time:.3f}s")
+
+    start_time = time.perf_counter()
+    rows = mentions = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        for values in iter_rows(args.tag, args.columns):
+            text = " ".join(values)
+            entities = gazetteer.tag(text)
+            f.write(json.dumps({"row": rows, "entities": entities}) + "\n")
+            rows += 1
+            mentions += len(entities)
+    elapsed = time.perf_counter() - start_time
+    print(f"Tagged {rows} rows ({mentions} company mentions) in {elapsed:.3f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,36 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hmac
+import os
+import time
+import orjson
+from datetime import datetime
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Dict, Literal, Optional, Union
+from model_cache import enable_offline_cache, load_manifest, resolve_model_path
+
+# Serve models from the local cache populated by download_models.py; when every required
+# model is cached, Hugging Face libraries are switched to offline mode before they are imported
+OFFLINE_CACHE = enable_offline_cache()
+
 from gliner import GLiNER
 from classification_model import TextClassifier
+from bse_classification import classify_announcement
+from attachments import AttachmentTextStore, chunk_text
+from company_stats import COMPANY_STATS_PATH, CompanyAggregates
+from dedup import deduplicate
+from rules import get_rule_store
+from model_registry import (ModelRegistry, UnknownModelError, ModelLoadingError, ModelLoadFailedError,
+                            ModelLoadConflictError)
+from scheduler import BatchScheduler, BULK, INTERACTIVE, PRIORITIES
+from span_decoding import SpanFilter
+from gazetteer import CompanyGazetteer, merge_entities
+from autotune import apply_profile, autotune, load_profile, save_profile, set_torch_threads, PROFILE_PATH
+from workload import load_corpus
+from arrow_batch import ARROW_STREAM, ArrowBatchError, entities_batch, read_batch, scores_batch, write_batch
+from profiling import StackSampler, TorchOpProfiler, build_report, timing_header, torch_available
 
 app = FastAPI(title="NLP API", description="API for Named Entity Recognition and Text Classification")
 
@@ -16,23 +43,173 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# GLiNER variants that can be selected per request with the `model` field
+NER_MODELS = {
+    "gliner-medium": "urchade/gliner_mediumv2.1",
+    "modern-gliner-bi-large": "knowledgator/modern-gliner-bi-large-v1.0",
+}
+DEFAULT_NER_MODEL = os.environ.get("DEFAULT_NER_MODEL", "gliner-medium")
+MODEL_MEMORY_BUDGET_MB = os.environ.get("MODEL_MEMORY_BUDGET_MB")
+
 # Initialize models
 print("Loading GLiNER model...")
-ner_model = GLiNER.from_pretrained("urchade/gliner_mediumv2.1")
-classifier = TextClassifier()
+model_registry = ModelRegistry(
+    loader=GLiNER.from_pretrained,
+    default=DEFAULT_NER_MODEL,
+    memory_budget_bytes=int(MODEL_MEMORY_BUDGET_MB) * 2 ** 20 if MODEL_MEMORY_BUDGET_MB else None
+)
+for model_name, model_source in NER_MODELS.items():
+    # Load by local path when the model is cached, so startup never touches the network
+    model_registry.register(model_name, resolve_model_path(model_name) or model_source)
+if not OFFLINE_CACHE:
+    print("Model cache incomplete, falling back to the Hugging Face Hub. Run download_models.py to populate it.")
+model_registry.load(DEFAULT_NER_MODEL, wait=True)
+rule_store = get_rule_store()
+classifier = TextClassifier(rule_store)
+
+# Listed-company gazetteer for the Company label, built from announcement CSVs
+GAZETTEER_SOURCES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    for path in os.environ.get("GAZETTEER_SOURCES", "Jan22_bse_announcements.csv").split(",") if path
+]
+company_gazetteer = CompanyGazetteer.from_csv([path for path in GAZETTEER_SOURCES if os.path.exists(path)])
+print(f"Loaded company gazetteer with {len(company_gazetteer)} companies")
+
+# Per-company rolling sentiment and category counters, updated by /analyze requests that carry a SCRIP_CD
+company_aggregates = (CompanyAggregates.load(COMPANY_STATS_PATH) if os.path.exists(COMPANY_STATS_PATH)
+                      else CompanyAggregates(int(os.environ.get("COMPANY_STATS_DAYS", 90))))
+COMPANY_STATS_SAVE_SECONDS = float(os.environ.get("COMPANY_STATS_SAVE_SECONDS", 60))
+company_names = {scrip_cd: name for scrip_cd, name in company_gazetteer.companies if scrip_cd}
+
+# Extracted text of announcement PDFs (ATTACHMENT_DIR), cached on disk and filled in the background
+attachment_store = AttachmentTextStore()
+
+# Batching and thread settings come from the autotuner's profile for this host when there is
+# one; environment variables still override individual settings
+tuning_profile = load_profile(DEFAULT_NER_MODEL)
+tuned = tuning_profile["settings"] if tuning_profile else {}
+if os.environ.get("TORCH_NUM_THREADS") or tuned.get("torch_threads"):
+    set_torch_threads(int(os.environ.get("TORCH_NUM_THREADS") or tuned["torch_threads"]))
+if tuning_profile:
+    print(f"Loaded tuning profile from {PROFILE_PATH}: {tuned}")
+
+# All NER goes through the scheduler: interactive requests are micro-batched and served
+# ahead of bulk work, which runs in small micro-batches between them
+scheduler = BatchScheduler(
+    model_registry,
+    max_batch_size=int(os.environ.get("NER_MAX_BATCH_SIZE", tuned.get("max_batch_size", 16))),
+    max_wait_ms=float(os.environ.get("NER_MAX_WAIT_MS", tuned.get("max_wait_ms", 5.0))),
+    bulk_batch_size=int(os.environ.get("NER_BULK_BATCH_SIZE", 8)),
+    interactive_weight=int(os.environ.get("NER_INTERACTIVE_WEIGHT", 8)),
+    bulk_weight=int(os.environ.get("NER_BULK_WEIGHT", 1))
+)
+
+AUTOTUNE_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               os.environ.get("AUTOTUNE_CORPUS", "Jan22_bse_announcements.csv"))
+autotune_state = {"running": False, "error": None}
+
+async def run_autotune(**kwargs):
+    """Tune the live scheduler against the sample corpus, then save and apply the profile"""
+    global tuning_profile
+    autotune_state.update(running=True, error=None)
+    if os.environ.get("TORCH_NUM_THREADS"):
+        kwargs.setdefault("threads", [int(os.environ["TORCH_NUM_THREADS"])])
+    try:
+        corpus = await asyncio.to_thread(load_corpus, AUTOTUNE_CORPUS, 500)
+        profile = await autotune(scheduler, corpus, model=DEFAULT_NER_MODEL, **kwargs)
+        save_profile(profile)
+        apply_profile(profile, scheduler)
+        tuning_profile = profile
+    except Exception as e:
+        autotune_state["error"] = str(e)
+        raise
+    finally:
+        autotune_state["running"] = False
+
+async def save_company_stats():
+    """Save the company aggregates every COMPANY_STATS_SAVE_SECONDS, so a crash loses at most that window"""
+    saved = company_aggregates.updates
+    while True:
+        await asyncio.sleep(COMPANY_STATS_SAVE_SECONDS)
+        updates = company_aggregates.updates
+        if updates == saved:
+            continue
+        try:
+            await asyncio.to_thread(company_aggregates.save, COMPANY_STATS_PATH)
+            saved = updates
+        except OSError as e:
+            print(f"Could not save company stats to {COMPANY_STATS_PATH}: {e}")
+
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Keyword rules are hot-swapped when rules.json changes; requests in flight keep their version
+    rule_store.start_watching()
+    background_tasks.append(asyncio.create_task(save_company_stats()))
+    if tuning_profile is None and os.environ.get("AUTOTUNE_ON_STARTUP") == "1":
+        # Tune before taking traffic so the trials measure an idle node
+        print("No tuning profile for this host, running the autotuner...")
+        await run_autotune(slo_ms=float(os.environ.get("AUTOTUNE_SLO_MS", 250)))
+    await scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    rule_store.stop_watching()
+    for task in background_tasks:
+        task.cancel()
+    await scheduler.stop()
+    attachment_store.close()
+    company_aggregates.save(COMPANY_STATS_PATH)
+
+@app.exception_handler(UnknownModelError)
+async def unknown_model_handler(request: Request, exc: UnknownModelError):
+    return JSONResponse(status_code=404, content={"detail": f"Unknown model: {exc.args[0]}"})
+
+@app.exception_handler(ModelLoadingError)
+async def model_loading_handler(request: Request, exc: ModelLoadingError):
+    # A failed model stays unavailable until it is reloaded, so retrying soon does not help
+    headers = None if isinstance(exc, ModelLoadFailedError) else {"Retry-After": "5"}
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+
+@app.exception_handler(ModelLoadConflictError)
+async def model_load_conflict_handler(request: Request, exc: ModelLoadConflictError):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+# Scheduling lane; set per request with the "priority" field or the X-Priority header
+Priority = Literal["interactive", "bulk"]
+
+def _priority(field: Optional[str], header: Optional[str], default: str = INTERACTIVE) -> str:
+    """The request field wins over the X-Priority header; both fall back to the endpoint's default"""
+    priority = field or (header.strip().lower() if header else None) or default
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"X-Priority must be one of: {', '.join(PRIORITIES)}")
+    return priority
 
 # NER Models
 class NERRequest(BaseModel):
     text: str
     labels: List[str]
     threshold: float = 0.5 #default threshold
+    model: Optional[str] = None  # registered model name, defaults to DEFAULT_NER_MODEL
+    # Use the company gazetteer for the Company label: merge with or replace the model's output
+    company_gazetteer: Optional[Literal["merge", "replace"]] = None
+    priority: Optional[Priority] = None
+    # Decoding options: per-label thresholds (others use `threshold`), the k best entities per
+    # label (one number for every label, or per label) and the longest span in words
+    label_thresholds: Optional[Dict[str, float]] = None
+    top_k: Optional[Union[int, Dict[str, int]]] = None
+    max_span_width: Optional[int] = None
 
     class Config:
         schema_extra = {
             "example": {
                 "text": "MRF Ltd's shares have seen a decline of over 3% in Friday's trading",
                 "labels": ["Company", "Person", "Sector"],
-                "threshold": 0.5
+                "threshold": 0.5,
+                "label_thresholds": {"Person": 0.7},
+                "top_k": {"Company": 1},
+                "model": "gliner-medium"
             }
         }
 
@@ -45,6 +222,20 @@ class Entity(BaseModel):
 class NERResponse(BaseModel):
     entities: List[Entity]
 
+class NERBatchRequest(BaseModel):
+    texts: List[str]
+    labels: List[str]
+    threshold: float = 0.5
+    model: Optional[str] = None
+    company_gazetteer: Optional[Literal["merge", "replace"]] = None
+    priority: Optional[Priority] = None  # defaults to bulk
+    label_thresholds: Optional[Dict[str, float]] = None
+    top_k: Optional[Union[int, Dict[str, int]]] = None
+    max_span_width: Optional[int] = None
+
+class NERBatchResponse(BaseModel):
+    results: List[NERResponse]
+
 # Classification Models
 #Input Schema
 class ClassificationRequest(BaseModel):
@@ -63,20 +254,210 @@ class ClassificationRequest(BaseModel):
 class ClassificationResponse(BaseModel):
     scores: Dict[str, float]
 
+class ClassificationBatchRequest(BaseModel):
+    texts: List[str]
+    labels: List[str]
+
+class ClassificationBatchResponse(BaseModel):
+    results: List[ClassificationResponse]
+
+# Combined analysis Models
+class AnalyzeRequest(BaseModel):
+    text: str
+    labels: List[str]
+    sentiment_labels: List[str] = ["bullish", "bearish", "neutral"]
+    threshold: float = 0.5
+    model: Optional[str] = None
+    priority: Optional[Priority] = None
+    # Attachment name (PDF_URL / ATTACHMENTNAME) of the announcement; its extracted text feeds the
+    # category rules and is tagged in chunks into attachment_entities
+    attachment: Optional[str] = None
+    # With a SCRIP_CD, the result is added to that company's rolling stats (GET /companies/{scrip_cd}/stats)
+    scrip_cd: Optional[str] = None
+    announced_at: Optional[datetime] = None  # defaults to now
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "text": "MRF Ltd's shares have seen a decline of over 3% in Friday's trading",
+                "labels": ["Company", "Person", "Sector"],
+                "sentiment_labels": ["bullish", "bearish", "neutral"],
+                "threshold": 0.5
+            }
+        }
+
+class AnalyzeResponse(BaseModel):
+    entities: List[Entity]
+    scores: Dict[str, float]
+    category: str
+    # Only with `attachment`; null until the attachment's text has been extracted
+    attachment_entities: Optional[List[Entity]] = None
+
+class AnalyzeBatchRequest(BaseModel):
+    texts: List[str]
+    labels: List[str]
+    sentiment_labels: List[str] = ["bullish", "bearish", "neutral"]
+    threshold: float = 0.5
+    model: Optional[str] = None
+    priority: Optional[Priority] = None  # defaults to bulk
+    # Per text, like AnalyzeRequest.scrip_cd / announced_at; texts with a SCRIP_CD update its company stats
+    scrip_cds: Optional[List[Optional[str]]] = None
+    announced_at: Optional[List[Optional[datetime]]] = None
+
+class AnalyzeBatchResponse(BaseModel):
+    results: List[AnalyzeResponse]
+
+# Model registry Models
+class ModelLoadRequest(BaseModel):
+    name: str
+    source: Optional[str] = None  # models.json name or repo id; required for new names
+
+def _entity_dicts(entities):
+    """Project raw GLiNER entities onto the Entity schema without building pydantic objects"""
+    return [
+        {"text": entity["text"], "label": entity["label"], "start": entity["start"], "end": entity["end"]}
+        for entity in entities
+    ]
+
+def _wants_timing(header: Optional[str]) -> bool:
+    return header is not None and header.strip().lower() not in ("", "0", "false", "no")
+
+def _timed_response(content: Dict, timings: Dict, start_time: float) -> ORJSONResponse:
+    """Serialize the body and report every stage in the X-Debug-Timing header"""
+    serialize_start = time.perf_counter()
+    response = ORJSONResponse(content)
+    now = time.perf_counter()
+    timings["serialize"] = (now - serialize_start) * 1000
+    timings["total"] = (now - start_time) * 1000
+    response.headers["X-Debug-Timing"] = timing_header(timings)
+    return response
+
+def _split_company_label(labels: List[str], mode: Optional[str]):
+    """(label served by the gazetteer or None, labels left for the model)"""
+    company_labels = [label for label in labels if label.lower() == "company"]
+    if not mode or not company_labels:
+        return None, labels
+    if mode == "replace":
+        # Only the remaining labels need the model; a Company-only request never touches it
+        return company_labels[0], [label for label in labels if label.lower() != "company"]
+    return company_labels[0], labels
+
+def _span_filter(request) -> SpanFilter:
+    """Decoding options of an NER request; invalid options are a 400"""
+    try:
+        return SpanFilter.build(request.labels, request.threshold, request.label_thresholds, request.top_k,
+                                request.max_span_width)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _predict_with_gazetteer(request: NERRequest, priority: str = INTERACTIVE, timings: Optional[Dict] = None):
+    """Model NER, with the Company label served by the gazetteer when the request asks for it"""
+    span_filter = _span_filter(request)
+    company_label, labels = _split_company_label(request.labels, request.company_gazetteer)
+    if company_label is None:
+        return await scheduler.predict(request.text, labels, span_filter, request.model, priority, timings)
+
+    start_time = time.perf_counter()
+    hits = company_gazetteer.tag(request.text, company_label)
+    if timings is not None:
+        timings["gazetteer"] = (time.perf_counter() - start_time) * 1000
+    model_entities = (await scheduler.predict(request.text, labels, span_filter, request.model, priority, timings)
+                      if labels else [])
+    return merge_entities(model_entities, hits)
+
+# Hot endpoints return ORJSONResponse built from plain dicts. Returning a Response skips
+# FastAPI's response_model validation and re-serialization; response_model still documents
+# the (identical) schema in OpenAPI.
 @app.post("/predict", response_model=NERResponse)
-async def predict_entities(request: NERRequest):
-    try:
-        entities = ner_model.predict_entities(request.text, request.labels, threshold=request.threshold)
-        response_entities = [
-            Entity(
-                text=entity["text"],
-                label=entity["label"],
-                start=entity["start"],
-                end=entity["end"]
-            )
-            for entity in entities
-        ]
-        return NERResponse(entities=response_entities)
+async def predict_entities(request: NERRequest, x_priority: Optional[str] = Header(None),
+                           x_debug_timing: Optional[str] = Header(None)):
+    priority = _priority(request.priority, x_priority)
+    start_time = time.perf_counter()
+    # A stage breakdown is only collected when the request asks for one
+    timings = {} if _wants_timing(x_debug_timing) else None
+    try:
+        entities = await _predict_with_gazetteer(request, priority, timings)
+        if timings is not None:
+            return _timed_response({"entities": _entity_dicts(entities)}, timings, start_time)
+        return ORJSONResponse({"entities": _entity_dicts(entities)})
+    except (HTTPException, UnknownModelError, ModelLoadingError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Many texts with the same labels in one round-trip (used by the client SDK to coalesce calls)
+@app.post("/predict/batch", response_model=NERBatchResponse)
+async def predict_batch(request: NERBatchRequest, x_priority: Optional[str] = Header(None)):
+    priority = _priority(request.priority, x_priority, default=BULK)
+    span_filter = _span_filter(request)
+    try:
+        company_label, labels = _split_company_label(request.labels, request.company_gazetteer)
+        if labels:
+            batch_entities = await _batch_entities(request.texts, labels, span_filter, request.model, priority)
+        else:
+            batch_entities = [[] for _ in request.texts]
+        if company_label is not None:
+            batch_entities = [
+                merge_entities(entities, company_gazetteer.tag(text, company_label))
+                for text, entities in zip(request.texts, batch_entities)
+            ]
+        return ORJSONResponse({"results": [{"entities": _entity_dicts(entities)} for entities in batch_entities]})
+    except (UnknownModelError, ModelLoadingError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Arrow IPC bulk endpoints: the body is an Arrow IPC stream with a text column and an ID column,
+# and the reply is a record batch of the IDs and the results (see arrow_batch.py)
+ARROW_MAX_BODY_BYTES = int(os.environ.get("ARROW_MAX_BODY_MB", 256)) * 2 ** 20
+
+async def _read_arrow(request: Request, text_column: str, id_column: str):
+    too_large = HTTPException(status_code=413, detail=f"Arrow body exceeds {ARROW_MAX_BODY_BYTES // 2 ** 20} MB")
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > ARROW_MAX_BODY_BYTES:
+        raise too_large
+    # Chunked bodies have no length up front; stop reading once the limit is passed
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > ARROW_MAX_BODY_BYTES:
+            raise too_large
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    try:
+        return await asyncio.to_thread(read_batch, body, text_column, id_column)
+    except ArrowBatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/predict/arrow", response_class=Response)
+async def predict_arrow(request: Request, labels: List[str] = Query(...), threshold: float = 0.5,
+                        model: Optional[str] = None, text_column: str = "text", id_column: str = "id",
+                        priority: Optional[Priority] = None, x_priority: Optional[str] = Header(None)):
+    priority = _priority(priority, x_priority, default=BULK)
+    batch = await _read_arrow(request, text_column, id_column)
+    try:
+        entities = await scheduler.predict_many(batch.unique_texts, labels, threshold, model, priority)
+        content = await asyncio.to_thread(lambda: write_batch(entities_batch(batch, entities)))
+        return Response(content, media_type=ARROW_STREAM)
+    except (UnknownModelError, ModelLoadingError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/classify/arrow", response_class=Response)
+async def classify_arrow(request: Request, labels: List[str] = Query(...), text_column: str = "text",
+                         id_column: str = "id"):
+    batch = await _read_arrow(request, text_column, id_column)
+    lexicon = rule_store.current.sentiment.words
+
+    def classify_all():
+        scores = [classifier.predict_proba(text, labels, lexicon) for text in batch.unique_texts]
+        return write_batch(scores_batch(batch, scores, labels))
+
+    try:
+        return Response(await asyncio.to_thread(classify_all), media_type=ARROW_STREAM)
+    except ArrowBatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -85,14 +466,357 @@ async def predict_entities(request: NERRequest):
 async def classify_text(request: ClassificationRequest):
     try:
         scores = classifier.predict_proba(request.text, request.labels)
-        return ClassificationResponse(scores=scores)
+        return ORJSONResponse({"scores": scores})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/classify/batch", response_model=ClassificationBatchResponse)
+async def classify_batch(request: ClassificationBatchRequest):
+    try:
+        # One lexicon version for the whole batch
+        lexicon = rule_store.current.sentiment.words
+
+        def classify_all():
+            return [{"scores": classifier.predict_proba(text, request.labels, lexicon)} for text in request.texts]
+
+        return ORJSONResponse({"results": await asyncio.to_thread(classify_all)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _rule_analysis(text: str, sentiment_labels: List[str], rules=None, timings: Optional[Dict] = None,
+                   attachment_text: str = ""):
+    """Sentiment scores and announcement category, sharing one normalization pass"""
+    start_time = time.perf_counter()
+    rules = rules or rule_store.current
+    lowered = text.lower()
+    scores = classifier.predict_proba_words(classifier._preprocess(lowered), sentiment_labels, rules.sentiment.words)
+    category = classify_announcement(lowered, rules=rules.bse_categories, attachment_text=attachment_text)
+    if timings is not None:
+        timings["rules"] = (time.perf_counter() - start_time) * 1000
+    return scores, category
+
+async def _batch_entities(texts: List[str], labels: List[str], threshold: Union[float, SpanFilter], model: Optional[str],
+                          priority: str):
+    """Run NER once per distinct text through the scheduler; repeated texts share the result"""
+    dedup = deduplicate(texts, exact_only=True)
+    unique_texts = [texts[index] for index in dedup.representatives]
+    entities = await scheduler.predict_many(unique_texts, labels, threshold, model, priority)
+    return dedup.expand(entities)
+
+async def _chunked_entities(text: str, labels: List[str], threshold: float, model: Optional[str], priority: str):
+    """NER over a text longer than the model's window, in chunks; offsets refer to the full text"""
+    chunks = chunk_text(text)
+    results = await scheduler.predict_many([chunk for _, chunk in chunks], labels, threshold, model, priority)
+    return [
+        dict(entity, start=entity["start"] + offset, end=entity["end"] + offset)
+        for (offset, _), entities in zip(chunks, results) for entity in entities
+    ]
+
+def _record_company_stats(scrip_cd: Optional[str], announced_at: Optional[datetime], category: str,
+                          scores: Dict[str, float]):
+    """Add a classified announcement to its company's rolling stats (no-op without a SCRIP_CD)"""
+    if scrip_cd:
+        company_aggregates.add(scrip_cd, announced_at or datetime.now(), category, scores,
+                               company_names.get(scrip_cd.strip(), ""))
+
+# Combined NER, sentiment and announcement category in one round-trip
+@app.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_text(request: AnalyzeRequest, x_priority: Optional[str] = Header(None),
+                       x_debug_timing: Optional[str] = Header(None)):
+    priority = _priority(request.priority, x_priority)
+    start_time = time.perf_counter()
+    timings = {} if _wants_timing(x_debug_timing) else None
+    try:
+        # Only cached attachment text is used; an attachment not extracted yet is queued, not waited for.
+        # Reading the cache touches the disk, so it runs off the event loop
+        attachment_text = (await asyncio.to_thread(attachment_store.text, request.attachment)
+                           if request.attachment else "")
+        stages = [
+            # NER is the expensive stage; it is batched off the event loop alongside the rule-based stages
+            scheduler.predict(request.text, request.labels, request.threshold, request.model, priority, timings),
+            asyncio.to_thread(_rule_analysis, request.text, request.sentiment_labels, None, timings, attachment_text)
+        ]
+        if attachment_text:
+            stages.append(_chunked_entities(attachment_text, request.labels, request.threshold, request.model, priority))
+        entities, (scores, category), *attachment_entities = await asyncio.gather(*stages)
+        _record_company_stats(request.scrip_cd, request.announced_at, category, scores)
+        content = {"entities": _entity_dicts(entities), "scores": scores, "category": category}
+        if request.attachment:
+            content["attachment_entities"] = _entity_dicts(attachment_entities[0]) if attachment_entities else None
+        if timings is not None:
+            return _timed_response(content, timings, start_time)
+        return ORJSONResponse(content)
+    except (UnknownModelError, ModelLoadingError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze/batch", response_model=AnalyzeBatchResponse)
+async def analyze_batch(request: AnalyzeBatchRequest, x_priority: Optional[str] = Header(None)):
+    # Batches are bulk traffic unless the caller says otherwise, so they never hold up single requests
+    priority = _priority(request.priority, x_priority, default=BULK)
+    for field in ("scrip_cds", "announced_at"):
+        values = getattr(request, field)
+        if values is not None and len(values) != len(request.texts):
+            raise HTTPException(status_code=400, detail=f"{field} must have one entry per text")
+    try:
+        rules = rule_store.current
+
+        def rule_batch():
+            return [_rule_analysis(text, request.sentiment_labels, rules) for text in request.texts]
+
+        batch_entities, rule_results = await asyncio.gather(
+            _batch_entities(request.texts, request.labels, request.threshold, request.model, priority),
+            asyncio.to_thread(rule_batch)
+        )
+        results = [
+            {"entities": _entity_dicts(entities), "scores": scores, "category": category}
+            for entities, (scores, category) in zip(batch_entities, rule_results)
+        ]
+        if request.scrip_cds:
+            announced = request.announced_at or [None] * len(request.texts)
+            for scrip_cd, announced_at, (scores, category) in zip(request.scrip_cds, announced, rule_results):
+                _record_company_stats(scrip_cd, announced_at, category, scores)
+        return ORJSONResponse({"results": results})
+    except (UnknownModelError, ModelLoadingError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _ws_handle(message: Dict) -> Dict:
+    """Run one WebSocket message and build its (ID-tagged) reply"""
+    message_id = message.get("id")
+    message_type = message.get("type")
+    reply = {"id": message_id, "type": message_type}
+    try:
+        if message_type == "predict":
+            request = NERRequest(**message)
+            entities = await _predict_with_gazetteer(request, request.priority or INTERACTIVE)
+            reply["result"] = {"entities": _entity_dicts(entities)}
+        elif message_type == "classify":
+            request = ClassificationRequest(**message)
+            reply["result"] = {"scores": classifier.predict_proba(request.text, request.labels)}
+        elif message_type == "analyze":
+            request = AnalyzeRequest(**message)
+            entities, (scores, category) = await asyncio.gather(
+                scheduler.predict(request.text, request.labels, request.threshold, request.model,
+                                  request.priority or INTERACTIVE),
+                asyncio.to_thread(_rule_analysis, request.text, request.sentiment_labels)
+            )
+            _record_company_stats(request.scrip_cd, request.announced_at, category, scores)
+            reply["result"] = {"entities": _entity_dicts(entities), "scores": scores, "category": category}
+        else:
+            reply.update(status=400, error=f"Unknown message type: {message_type}")
+    except ValidationError as e:
+        reply.update(status=422, error=str(e))
+    except UnknownModelError as e:
+        reply.update(status=404, error=f"Unknown model: {e.args[0]}")
+    except ModelLoadingError as e:
+        reply.update(status=503, error=str(e))
+    except HTTPException as e:
+        reply.update(status=e.status_code, error=e.detail)
+    except Exception as e:
+        reply.update(status=500, error=str(e))
+    return reply
+
+# Persistent channel for high-frequency clients. Messages are JSON objects with an "id",
+# a "type" (predict / classify / analyze) and that endpoint's request fields. They are
+# processed concurrently and answered in completion order, tagged with the same id.
+@app.websocket("/ws")
+async def inference_socket(websocket: WebSocket):
+    await websocket.accept()
+    outgoing = asyncio.Queue()
+    in_flight = asyncio.Semaphore(int(os.environ.get("WS_MAX_IN_FLIGHT", 256)))
+
+    async def writer():
+        while True:
+            reply = await outgoing.get()
+            await websocket.send_text(orjson.dumps(reply).decode())
+
+    async def handle(message):
+        try:
+            await outgoing.put(await _ws_handle(message))
+        finally:
+            in_flight.release()
+
+    writer_task = asyncio.create_task(writer())
+    tasks = set()
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                message = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                await outgoing.put({"id": None, "status": 400, "error": "Invalid JSON"})
+                continue
+            if not isinstance(message, dict):
+                await outgoing.put({"id": None, "status": 400, "error": "Messages must be JSON objects"})
+                continue
+            # Backpressure: stop reading once too many messages are outstanding
+            await in_flight.acquire()
+            task = asyncio.create_task(handle(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        writer_task.cancel()
+
+# Operations that change server state need an X-Admin-Token header matching ADMIN_TOKEN
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+# Rule set administration
+@app.get("/rules")
+async def rules_info():
+    rules = rule_store.current
+    return {"version": rules.version, "source": rules.source, "loaded_at": rules.loaded_at.isoformat()}
+
+@app.post("/rules/reload", dependencies=[Depends(require_admin)])
+async def reload_rules():
+    swapped = rule_store.reload()
+    if not swapped:
+        raise HTTPException(status_code=400, detail="Rules file failed to load; the previous version is still active")
+    return await rules_info()
+
+@app.get("/attachments")
+async def attachments_status():
+    """Attachment text extraction: extracted, failed, missing and pending counts"""
+    return attachment_store.status()
+
+@app.get("/companies/stats")
+async def company_rankings(days: int = 7, sort_by: str = "announcements", limit: int = 20):
+    """Companies ranked by announcement count or mean sentiment score over the last `days` days"""
+    try:
+        return {"status": company_aggregates.status(), "companies": company_aggregates.top(days, sort_by, limit)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/companies/{scrip_cd}/stats")
+async def company_stats(scrip_cd: str, days: int = 7):
+    """One company's announcement count, mean sentiment and category counts over the last `days` days"""
+    try:
+        stats = company_aggregates.query(scrip_cd, days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"No announcements for {scrip_cd}")
+    return stats
+
+@app.get("/scheduler")
+async def scheduler_status():
+    """Queue depth and throughput per priority lane"""
+    return scheduler.stats()
+
+# Autotuning. On-demand runs tune the live scheduler, so live requests see the trial settings
+# and skew the measurements; run them on a drained node.
+class AutotuneRequest(BaseModel):
+    slo_ms: float = 250.0
+    concurrency: int = 32
+    requests: int = 256
+
+@app.get("/tuning")
+async def tuning_info():
+    return {
+        "profile_path": PROFILE_PATH,
+        "profile": {key: value for key, value in tuning_profile.items() if key != "trials"} if tuning_profile else None,
+        "active": scheduler.stats()["interactive"],
+        **autotune_state,
+    }
+
+@app.post("/tuning/autotune", status_code=202, dependencies=[Depends(require_admin)])
+async def start_autotune(request: AutotuneRequest):
+    if autotune_state["running"]:
+        raise HTTPException(status_code=409, detail="Autotuning is already running")
+    task = asyncio.create_task(run_autotune(slo_ms=request.slo_ms, concurrency=request.concurrency,
+                                            requests=request.requests))
+    # The outcome is reported by GET /tuning; keep the exception from being logged as unretrieved
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    autotune_state["running"] = True
+    return await tuning_info()
+
+# Profiling (admin only). The profiler observes live traffic for a bounded time window.
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 60))
+profiling_lock = asyncio.Lock()
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def capture_profile(seconds: float = 10.0, interval_ms: float = 5.0, torch_ops: bool = True):
+    """Sample all threads (and torch operators on the inference thread) for `seconds`; returns a zip report"""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+    if profiling_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    async with profiling_lock:
+        sampler = StackSampler(max(interval_ms, 1.0) / 1000)
+        torch_profiler = TorchOpProfiler() if torch_ops and torch_available() else None
+        served_before = {name: lane["served"] for name, lane in scheduler.stats().items()}
+        started_at = datetime.now()
+        if torch_profiler is not None:
+            await scheduler.run_in_inference_thread(torch_profiler.start)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+            if torch_profiler is not None:
+                await scheduler.run_in_inference_thread(torch_profiler.stop)
+        summary = {
+            "started_at": started_at.isoformat(),
+            "seconds": seconds,
+            "sampling_interval_ms": sampler.interval * 1000,
+            "sampling_rounds": sampler.samples,
+            "torch_profile": torch_profiler is not None,
+            "requests_served": {name: lane["served"] - served_before[name] for name, lane in scheduler.stats().items()},
+        }
+        report = await asyncio.to_thread(build_report, summary, sampler, torch_profiler)
+    return Response(content=report, media_type="application/zip", headers={
+        "Content-Disposition": f'attachment; filename="profile_{started_at:%Y%m%d_%H%M%S}.zip"'
+    })
+
+# Model registry administration
+@app.get("/models")
+async def list_models():
+    return model_registry.status()
+
+def _allowed_source(source: str) -> str:
+    """
+    Only models listed in the models.json manifest can be loaded, by manifest name or repo id.
+    Cached models load from their local snapshot.
+    """
+    try:
+        manifest = load_manifest()
+    except OSError:
+        manifest = {"models": []}
+    for entry in manifest["models"]:
+        if source in (entry["name"], entry["repo_id"]):
+            return resolve_model_path(entry["name"], manifest) or entry["repo_id"]
+    raise HTTPException(status_code=400, detail=f"Model source {source} is not listed in the models.json manifest")
+
+@app.post("/models/load", status_code=202, dependencies=[Depends(require_admin)])
+async def load_model(request: ModelLoadRequest):
+    # Loads and warms in the background, then swaps atomically; the old version drains
+    source = _allowed_source(request.source) if request.source is not None else None
+    model_registry.load(request.name, source)
+    return model_registry.status()["models"][request.name]
+
+@app.delete("/models/{name}", dependencies=[Depends(require_admin)])
+async def unload_model(name: str):
+    if name == model_registry.default:
+        raise HTTPException(status_code=400, detail="The default model cannot be unloaded")
+    model_registry.unload(name)
+    return model_registry.status()
+
 # Add a root endpoint for testing
 @app.get("/")
 async def root():
-    return {"message": "API is running. Use /predict for NER and /classify for text classification."}
+    return {"message": "API is running. Use /predict for NER, /classify for text classification and /analyze for both plus the announcement category."}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_PATH = os.environ.get("MODEL_MANIFEST", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models.json"))
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    # The cache directory is relative to the manifest unless overridden
+    cache_dir = os.environ.get("MODEL_CACHE_DIR", manifest.get("cache_dir", "models"))
+    manifest["cache_dir"] = os.path.join(os.path.dirname(os.path.abspath(path)), cache_dir)
+    return manifest
+
+
+def lock_path(cache_dir: str, name: str) -> str:
+    return os.path.join(cache_dir, "locks", f"{name}.json")
+
+
+def read_lock(cache_dir: str, name: str) -> Optional[Dict]:
+    try:
+        with open(lock_path(cache_dir, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_snapshot(snapshot_dir: str) -> Dict[str, Dict]:
+    """sha256 and size of every file in a downloaded snapshot"""
+    files = {}
+    for root, _, names in os.walk(snapshot_dir):
+        for file_name in names:
+            path = os.path.join(root, file_name)
+            relative = os.path.relpath(path, snapshot_dir).replace(os.sep, "/")
+            files[relative] = {"sha256": file_sha256(path), "size": os.path.getsize(path)}
+    return files
+
+
+def verify_snapshot(cache_dir: str, lock: Dict, full: bool = False) -> Tuple[bool, List[str]]:
+    """
+    Check a locked snapshot is complete. The quick check compares file sizes;
+    full=True re-hashes every file against the recorded sha256.
+    """
+    problems = []
+    snapshot_dir = os.path.join(cache_dir, lock["snapshot"])
+    for relative, expected in lock["files"].items():
+        path = os.path.join(snapshot_dir, relative)
+        if not os.path.isfile(path):
+            problems.append(f"missing {relative}")
+        elif os.path.getsize(path) != expected["size"]:
+            problems.append(f"size mismatch {relative}")
+        elif full and file_sha256(path) != expected["sha256"]:
+            problems.append(f"checksum mismatch {relative}")
+    return not problems, problems
+
+
+def resolve_model_path(name: str, manifest: Optional[Dict] = None, full: bool = False) -> Optional[str]:
+    """Local snapshot directory of a cached, valid model, or None"""
+    manifest = manifest or load_manifest()
+    lock = read_lock(manifest["cache_dir"], name)
+    if lock is None:
+        return None
+    ok, _ = verify_snapshot(manifest["cache_dir"], lock, full=full)
+    return os.path.join(manifest["cache_dir"], lock["snapshot"]) if ok else None
+
+
+def enable_offline_cache(manifest: Optional[Dict] = None) -> bool:
+    """
+    Point Hugging Face libraries at the local cache and forbid network access when
+    every required model is cached. Must run before gliner/transformers are imported.
+    """
+    try:
+        manifest = manifest or load_manifest()
+    except OSError:
+        return False
+    required = [entry["name"] for entry in manifest["models"] if entry.get("required", True)]
+    if not all(resolve_model_path(name, manifest) for name in required):
+        return False
+    os.environ.setdefault("HF_HUB_CACHE", manifest["cache_dir"])
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    return True
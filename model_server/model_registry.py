@@ -0,0 +1,244 @@
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXT = "MRF Ltd's shares have seen a decline of over 3% in Friday's trading"
+WARMUP_LABELS = ["Company", "Person", "Sector"]
+
+
+class UnknownModelError(KeyError):
+    """The requested model name is not registered"""
+
+
+class ModelLoadingError(RuntimeError):
+    """The requested model is registered but not ready yet"""
+
+
+class ModelLoadFailedError(ModelLoadingError):
+    """The model's last load failed; requests do not retry it until it is loaded again explicitly"""
+
+
+class ModelLoadConflictError(RuntimeError):
+    """A load of the model from a different source is still running"""
+
+
+def estimate_model_bytes(model) -> int:
+    """Parameter + buffer memory of a torch module, 0 if it isn't one"""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+    except AttributeError:
+        return 0
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelHandle:
+    """One loaded version of a named model, with its in-flight request count"""
+
+    def __init__(self, name: str, source: str, model, version: int):
+        self.name = name
+        self.source = source
+        self.model = model
+        self.version = version
+        self.size_bytes = estimate_model_bytes(model)
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.in_flight = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "source": self.source,
+            "version": self.version,
+            "size_mb": round(self.size_bytes / 2 ** 20, 1),
+            "in_flight": self.in_flight,
+            "loaded_at": self.loaded_at,
+            "last_used": self.last_used,
+        }
+
+
+class ModelRegistry:
+    """
+    Named GLiNER variants with background loading and zero-downtime swaps.
+
+    A (re)load happens in a background thread: the new version is loaded, warmed with
+    one prediction, and then swapped in under the lock. Requests that acquired the old
+    version keep using it; it is released once its last request finishes. Idle models
+    are evicted least-recently-used first when loaded models exceed memory_budget_bytes.
+    """
+
+    def __init__(self, loader: Callable[[str], object], default: str,
+                 memory_budget_bytes: Optional[int] = None):
+        self.loader = loader
+        self.default = default
+        self.memory_budget_bytes = memory_budget_bytes
+        self._sources: Dict[str, str] = {}
+        self._active: Dict[str, ModelHandle] = {}
+        self._draining: List[ModelHandle] = []
+        self._loading: Dict[str, threading.Thread] = {}
+        self._errors: Dict[str, str] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, source: str):
+        """Declare a model variant without loading it"""
+        with self._lock:
+            self._sources[name] = source
+
+    def _load_handle(self, name: str, source: str) -> ModelHandle:
+        start_time = time.perf_counter()
+        model = self.loader(source)
+        model.predict_entities(WARMUP_TEXT, WARMUP_LABELS)
+        with self._lock:
+            version = self._versions.get(name, 0) + 1
+            self._versions[name] = version
+        handle = ModelHandle(name, source, model, version)
+        logger.info("Loaded and warmed model %s v%d from %s in %.1fs",
+                    name, version, source, time.perf_counter() - start_time)
+        return handle
+
+    def _swap_in(self, handle: ModelHandle):
+        with self._lock:
+            previous = self._active.get(handle.name)
+            self._active[handle.name] = handle
+            self._errors.pop(handle.name, None)
+            if previous is not None:
+                self._draining.append(previous)
+            self._release_drained()
+        self._evict_if_needed(keep=handle.name)
+
+    def load(self, name: str, source: Optional[str] = None, wait: bool = False):
+        """
+        Load (or reload) a model and swap it in when it is warm.
+        Runs in a background thread unless wait=True. A call for a model that is already
+        loading joins that load, unless it asks for a different source (ModelLoadConflictError).
+        """
+        with self._lock:
+            if name in self._loading:
+                # Joining the running load would silently keep its source
+                if source is not None and source != self._sources[name]:
+                    raise ModelLoadConflictError(
+                        f"Model {name} is still loading from {self._sources[name]}; retry when it finishes")
+                thread = self._loading[name]
+            else:
+                if source is not None:
+                    self._sources[name] = source
+                if name not in self._sources:
+                    raise UnknownModelError(name)
+                source = self._sources[name]
+                self._errors.pop(name, None)
+                thread = threading.Thread(target=self._load_worker, args=(name, source),
+                                          name=f"load-{name}", daemon=True)
+                self._loading[name] = thread
+                thread.start()
+        if wait:
+            thread.join()
+            if name in self._errors:
+                raise RuntimeError(self._errors[name])
+
+    def _load_worker(self, name: str, source: str):
+        try:
+            self._swap_in(self._load_handle(name, source))
+        except Exception as e:
+            logger.error("Failed to load model %s from %s: %s", name, source, e)
+            with self._lock:
+                self._errors[name] = str(e)
+        finally:
+            with self._lock:
+                self._loading.pop(name, None)
+
+    @contextmanager
+    def acquire(self, name: Optional[str] = None):
+        """Borrow the active version of a model for the duration of a request"""
+        name = name or self.default
+        with self._lock:
+            handle = self._active.get(name)
+            if handle is None:
+                if name not in self._sources:
+                    raise UnknownModelError(name)
+                loading = name in self._loading
+                error = self._errors.get(name)
+        if handle is None:
+            # A failed model is not retried per request; that would start a load for every request
+            if error is not None and not loading:
+                raise ModelLoadFailedError(f"Model {name} failed to load ({error}); load it again explicitly")
+            # Cold model: load it in the background rather than stalling this request
+            if not loading:
+                self.load(name)
+            raise ModelLoadingError(f"Model {name} is loading, retry shortly")
+
+        with self._lock:
+            handle.in_flight += 1
+            handle.last_used = time.time()
+        try:
+            yield handle.model
+        finally:
+            with self._lock:
+                handle.in_flight -= 1
+                self._release_drained()
+
+    def unload(self, name: str):
+        """Remove a model; requests already using it finish first"""
+        with self._lock:
+            handle = self._active.pop(name, None)
+            if handle is None:
+                raise UnknownModelError(name)
+            self._draining.append(handle)
+            self._release_drained()
+
+    def _release_drained(self):
+        """Drop retired versions with no requests left. Caller holds the lock."""
+        still_draining = []
+        released = False
+        for handle in self._draining:
+            if handle.in_flight > 0:
+                still_draining.append(handle)
+            else:
+                logger.info("Released model %s v%d", handle.name, handle.version)
+                handle.model = None
+                released = True
+        self._draining = still_draining
+        if released:
+            # Not here: the lock is held, and acquire() gets here on the event loop
+            threading.Thread(target=gc.collect, name="model-gc", daemon=True).start()
+
+    def _evict_if_needed(self, keep: str):
+        if not self.memory_budget_bytes:
+            return
+        with self._lock:
+            total = sum(h.size_bytes for h in self._active.values()) + sum(h.size_bytes for h in self._draining)
+            idle = sorted(
+                (h for h in self._active.values() if h.in_flight == 0 and h.name not in (keep, self.default)),
+                key=lambda h: h.last_used
+            )
+            for handle in idle:
+                if total <= self.memory_budget_bytes:
+                    break
+                logger.info("Evicting idle model %s to stay within the memory budget", handle.name)
+                del self._active[handle.name]
+                total -= handle.size_bytes
+                self._draining.append(handle)
+            self._release_drained()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "default": self.default,
+                "memory_budget_mb": round(self.memory_budget_bytes / 2 ** 20, 1) if self.memory_budget_bytes else None,
+                "models": {
+                    name: {
+                        "source": source,
+                        "state": ("loading" if name in self._loading else
+                                  "loaded" if name in self._active else
+                                  "failed" if name in self._errors else "registered"),
+                        "error": self._errors.get(name),
+                        "active": self._active[name].to_dict() if name in self._active else None,
+                    }
+                    for name, source in self._sources.items()
+                },
+                "draining": [{"name": h.name, "version": h.version, "in_flight": h.in_flight}
+                             for h in self._draining],
+            }
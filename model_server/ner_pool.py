@@ -0,0 +1,310 @@
+"""
+Multi-process offline NER for announcement archives.
+
+One GLiNER process cannot keep a many-core host busy, and N independent loaders hold N copies
+of the weights. NERPool loads the model once and forks N worker processes from it. The weights
+are read-only, so the workers share the parent's pages copy-on-write and the pool costs roughly
+one model's memory. The gc is frozen across the fork so that collections do not write to, and
+so copy, the shared pages. On platforms without fork, the weights are moved to shared memory
+and passed by handle.
+
+Texts reach the workers through a shared-memory ring of two slots. While the workers run one
+chunk of the input, the next chunk is encoded into the other slot. Within a chunk, texts are
+sorted by length and cut into batches, so each batch pads to similar lengths, and the longest
+batches are queued first. The task queue carries only batch descriptors (slot and text
+indices), and results come back in input order.
+
+    python ner_pool.py Jan22_bse_announcements.csv --workers 8 --output entities.jsonl
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from span_decoding import SpanFilter, batch_predict
+
+SLOTS = 2
+
+
+def _private_mb() -> Optional[float]:
+    """Memory this process does not share with any other (Linux only)"""
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            kb = sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean", "Private_Dirty")))
+    except OSError:
+        return None
+    return round(kb / 1024, 1)
+
+
+def _worker(worker_id: int, model, labels: List[str], span_filter: SpanFilter, threads: int,
+            text_buffer, offset_buffer, slot_bytes: int, tasks, results):
+    """Worker process loop: decode a batch of texts from the ring, run NER, send the entities back"""
+    import torch
+
+    torch.set_num_threads(threads)
+    data = memoryview(text_buffer).cast("B")
+    offsets = np.frombuffer(offset_buffer, dtype=np.int64).reshape(SLOTS, -1)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        chunk_id, slot, indices = task
+        start_time = time.perf_counter()
+        base, slot_offsets = slot * slot_bytes, offsets[slot]
+        texts = [str(data[base + slot_offsets[i]:base + slot_offsets[i + 1]], "utf-8") for i in indices]
+        # GLiNER cannot collate a text without words; blank archive rows have no entities
+        entities, error = [[] for _ in texts], None
+        present = [i for i, text in enumerate(texts) if text.strip()]
+        try:
+            if present:
+                for i, text_entities in zip(present, batch_predict(model, [texts[i] for i in present], labels, span_filter)):
+                    entities[i] = text_entities
+        except Exception:
+            entities, error = None, traceback.format_exc()
+        results.put((chunk_id, worker_id, indices, entities, time.perf_counter() - start_time, _private_mb(), error))
+
+
+class _Chunk:
+    """Results of one ring slot's texts, filled in as batches finish"""
+
+    def __init__(self, size: int, batches: int):
+        self.results: List[Optional[List[Dict]]] = [None] * size
+        self.remaining = batches
+
+
+class NERPool:
+    """Worker processes sharing one loaded GLiNER model, fed through a shared-memory text ring"""
+
+    def __init__(self, model, labels: List[str], workers: Optional[int] = None, batch_size: int = 16,
+                 span_filter: Optional[SpanFilter] = None, threads_per_worker: Optional[int] = None,
+                 chunk_size: int = 4096, buffer_mb: int = 64):
+        cpus = os.cpu_count() or 1
+        self.model = model
+        self.labels = list(labels)
+        self.workers = workers or cpus
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+        self.batch_size = batch_size
+        self.span_filter = span_filter or SpanFilter()
+        self.chunk_size = chunk_size
+        self.slot_bytes = buffer_mb * 2 ** 20 // SLOTS
+        self.stats_by_worker = [
+            {"texts": 0, "batches": 0, "busy_s": 0.0, "private_mb": None} for _ in range(self.workers)
+        ]
+        self.texts = 0
+        self.elapsed_s = 0.0
+        self._context = None
+        self._processes: List = []
+        self._next_chunk = 0
+
+    def start(self):
+        if self._processes:
+            return
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        if method == "spawn":
+            self.model.share_memory()
+        import torch.multiprocessing  # registers the tensor reducers used when spawning
+
+        self._context = torch.multiprocessing.get_context(method)
+        self._text_buffer = self._context.RawArray("B", self.slot_bytes * SLOTS)
+        self._offset_buffer = self._context.RawArray("q", SLOTS * (self.chunk_size + 1))
+        self._data = memoryview(self._text_buffer).cast("B")
+        self._offsets = np.frombuffer(self._offset_buffer, dtype=np.int64).reshape(SLOTS, -1)
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        gc.collect()
+        gc.freeze()
+        try:
+            for worker_id in range(self.workers):
+                process = self._context.Process(
+                    target=_worker, daemon=True, name=f"ner-worker-{worker_id}",
+                    args=(worker_id, self.model, self.labels, self.span_filter, self.threads_per_worker,
+                          self._text_buffer, self._offset_buffer, self.slot_bytes, self._tasks, self._results))
+                process.start()
+                self._processes.append(process)
+        finally:
+            gc.unfreeze()
+
+    def _fill(self, slot: int, texts: Iterator[str], carry: List[bytes]) -> List[int]:
+        """
+        Encode the next chunk of texts into a ring slot; returns their byte lengths. A text that
+        does not fit the slot is left in `carry` for the next chunk.
+        """
+        lengths, position, base = [], 0, slot * self.slot_bytes
+        offsets = self._offsets[slot]
+        while len(lengths) < self.chunk_size:
+            if carry:
+                encoded = carry.pop()
+            else:
+                text = next(texts, None)
+                if text is None:
+                    break
+                encoded = text.encode("utf-8")
+            if position + len(encoded) > self.slot_bytes:
+                if not lengths:
+                    raise ValueError(f"A text of {len(encoded)} bytes does not fit the input buffer; raise buffer_mb")
+                carry.append(encoded)
+                break
+            self._data[base + position:base + position + len(encoded)] = encoded
+            offsets[len(lengths)] = position
+            position += len(encoded)
+            lengths.append(len(encoded))
+        offsets[len(lengths)] = position
+        return lengths
+
+    def _collect(self, chunks: Dict[int, _Chunk]):
+        """Wait for one finished batch and store its entities in its chunk"""
+        while True:
+            try:
+                message = self._results.get(timeout=1.0)
+                break
+            except queue.Empty:
+                dead = [process for process in self._processes if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"NER worker {dead[0].name} exited with code {dead[0].exitcode}")
+        chunk_id, worker_id, indices, entities, busy_s, private_mb, error = message
+        if error is not None:
+            raise RuntimeError(f"NER worker {worker_id} failed:\n{error}")
+        stats = self.stats_by_worker[worker_id]
+        stats["texts"] += len(indices)
+        stats["batches"] += 1
+        stats["busy_s"] += busy_s
+        stats["private_mb"] = private_mb
+        chunk = chunks.get(chunk_id)
+        if chunk is None:  # left over from an abandoned map()
+            return
+        for index, text_entities in zip(indices, entities):
+            chunk.results[index] = text_entities
+        chunk.remaining -= 1
+
+    def map(self, texts: Iterable[str]) -> Iterator[List[Dict]]:
+        """Entities of every text, in input order. The input is consumed lazily, one chunk at a time."""
+        self.start()
+        texts = iter(texts)
+        carry: List[bytes] = []
+        chunks: Dict[int, _Chunk] = {}
+        in_flight = deque()
+        start_time = time.perf_counter()
+        try:
+            while True:
+                # Keep every slot of the ring busy
+                while len(in_flight) < SLOTS:
+                    chunk_id = self._next_chunk
+                    lengths = self._fill(chunk_id % SLOTS, texts, carry)
+                    if not lengths:
+                        break
+                    self._next_chunk += 1
+                    order = np.argsort(-np.array(lengths), kind="stable").tolist()
+                    batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+                    chunks[chunk_id] = _Chunk(len(lengths), len(batches))
+                    for batch in batches:
+                        self._tasks.put((chunk_id, chunk_id % SLOTS, batch))
+                    in_flight.append(chunk_id)
+                if not in_flight:
+                    return
+                # The oldest chunk's slot is reused only after all of its batches are back
+                chunk_id = in_flight.popleft()
+                while chunks[chunk_id].remaining:
+                    self._collect(chunks)
+                chunk = chunks.pop(chunk_id)
+                self.texts += len(chunk.results)
+                yield from chunk.results
+        finally:
+            self.elapsed_s += time.perf_counter() - start_time
+
+    def predict(self, texts: List[str]) -> List[List[Dict]]:
+        return list(self.map(texts))
+
+    def stats(self) -> Dict:
+        """Overall and per-worker throughput; texts_per_s of a worker is over its busy time"""
+        from model_registry import estimate_model_bytes
+
+        return {
+            "texts": self.texts,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "texts_per_s": round(self.texts / self.elapsed_s, 1) if self.elapsed_s else None,
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "model_mb": round(estimate_model_bytes(self.model) / 2 ** 20, 1),
+            "per_worker": [
+                dict(stats, worker=worker_id, busy_s=round(stats["busy_s"], 3),
+                     texts_per_s=round(stats["texts"] / stats["busy_s"], 1) if stats["busy_s"] else None)
+                for worker_id, stats in enumerate(self.stats_by_worker)
+            ],
+        }
+
+    def close(self):
+        if not self._processes:
+            return
+        # Drop queued batches so the workers reach their stop sentinel
+        try:
+            while True:
+                self._tasks.get_nowait()
+        except queue.Empty:
+            pass
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    from model_cache import enable_offline_cache, resolve_model_path
+    enable_offline_cache()
+    from gliner import GLiNER
+
+    from bse_classification import iter_rows
+
+    parser = argparse.ArgumentParser(description="Run NER over announcement CSVs on a pool of processes")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--output", default="entities.jsonl", help="One JSON line per announcement")
+    parser.add_argument("--labels", nargs="+", default=["Company", "Person", "Sector"])
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--model", default="gliner-medium")
+    parser.add_argument("--source", default="urchade/gliner_mediumv2.1", help="Used when the model is not cached")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--id-column", default="UUID")
+    args = parser.parse_args()
+
+    print("Loading GLiNER model...")
+    model = GLiNER.from_pretrained(resolve_model_path(args.model) or args.source)
+    pool = NERPool(model, args.labels, args.workers, args.batch_size, SpanFilter.build(args.labels, args.threshold),
+                   args.threads_per_worker)
+    rows = [row for path in args.csv_files for row in iter_rows(path, [args.id_column, "HEADLINE", "DESCRIPTION_1"])]
+    print(f"{len(rows)} announcements, {pool.workers} workers x {pool.threads_per_worker} threads")
+
+    texts = (f"{headline}. {description}".strip(". ") for _, headline, description in rows)
+    with pool, open(args.output, "w", encoding="utf-8") as f:
+        for (row_id, _, _), entities in zip(rows, pool.map(texts)):
+            f.write(json.dumps({args.id_column.lower(): row_id, "entities": entities}) + "\n")
+
+    stats = pool.stats()
+    print(f"{stats['texts']} texts in {stats['elapsed_s']:.1f}s ({stats['texts_per_s']} texts/s), "
+          f"model {stats['model_mb']} MB")
+    for worker in stats["per_worker"]:
+        print(f"  worker {worker['worker']}: {worker['texts']} texts in {worker['batches']} batches, "
+              f"{worker['texts_per_s']} texts/s busy, {worker['private_mb']} MB private")
+    print(f"Saved entities to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+PDF text extraction worker for attachments.AttachmentTextStore.
+
+The store runs this file as a separate program, one per worker, and sends it one task per
+line on stdin: a JSON [pdf path, cache path, max chars] list. Each answer is a JSON
+[characters written, extracted successfully] line on stdout. The workers are independent programs
+rather than multiprocessing children, so starting one never re-imports the launching script
+(main.py loads the NER models at import) and never forks the server's threads.
+"""
+import json
+import os
+import sys
+from typing import Tuple
+
+
+def extract_pdf(pdf_path: str, cache_path: str, max_chars: int) -> Tuple[int, bool]:
+    """
+    Extract the text of one PDF and write it to its cache file.
+    Returns (characters written, extracted successfully).
+    """
+    from pypdf import PdfReader
+
+    parts, length, ok = [], 0, True
+    try:
+        for page in PdfReader(pdf_path).pages:
+            page_text = page.extract_text() or ""
+            parts.append(page_text)
+            length += len(page_text) + 1
+            if length >= max_chars:
+                break
+    except Exception:
+        ok = False
+    text = " ".join(" ".join(parts).split())[:max_chars]
+
+    # Write-then-rename so readers never see a partial file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, cache_path)
+    return len(text), ok
+
+
+def main():
+    # Answers go to the original stdout; anything pypdf prints goes to stderr instead
+    answers = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    for line in sys.stdin:
+        pdf_path, cache_path, max_chars = json.loads(line)
+        answers.write(json.dumps(extract_pdf(pdf_path, cache_path, max_chars)) + "\n")
+        answers.flush()
+
+
+if __name__ == "__main__":
+    main()
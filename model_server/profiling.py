@@ -0,0 +1,138 @@
+"""
+On-demand profiling for the API server.
+
+- StackSampler: wall-clock sampling of every thread's Python stack (event loop, inference
+  thread, helpers), reported as a top-functions table and as folded stacks for flame graphs.
+- TorchOpProfiler: torch operator-level profile of the batches run on the inference thread.
+- timing_header: per-request X-Debug-Timing breakdowns; the tokenize / forward / decode stages
+  are measured by span_decoding.batch_predict.
+
+None of this runs unless a profile or a timing breakdown is requested.
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from typing import Dict, Optional
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of all threads every `interval` seconds from a background thread"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, str(ident)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """One 'thread;outer;...;inner count' line per distinct stack (flamegraph.pl / speedscope)"""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 50) -> str:
+        """Functions by self (innermost frame) and inclusive sample counts"""
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack[1:]):
+                inclusive[function] += count
+        total = sum(self.stacks.values()) or 1
+        lines = [f"{self.samples} sampling rounds, {total} thread samples, interval {self.interval * 1000:.1f} ms", ""]
+        for title, counter in (("Self", own), ("Inclusive", inclusive)):
+            lines.append(f"{title:>9}      %  function")
+            for function, count in counter.most_common(limit):
+                lines.append(f"{count:>9} {100 * count / total:6.2f}  {function}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+class TorchOpProfiler:
+    """
+    torch.profiler session. start() and stop() must run on the thread that executes the
+    model (see BatchScheduler.run_in_inference_thread).
+    """
+
+    def __init__(self):
+        import torch
+        self._profiler = torch.profiler.profile(
+            activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True
+        )
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+
+    def table(self, limit: int = 50) -> str:
+        return self._profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=limit)
+
+    def chrome_trace(self) -> bytes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "trace.json")
+            self._profiler.export_chrome_trace(path)
+            with open(path, "rb") as f:
+                return f.read()
+
+
+def torch_available() -> bool:
+    try:
+        import torch  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_report(summary: Dict, sampler: StackSampler, torch_profiler: Optional[TorchOpProfiler] = None) -> bytes:
+    """Zip archive with the summary and every captured profile"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("summary.json", json.dumps(summary, indent=4))
+        archive.writestr("cpu_top.txt", sampler.top())
+        archive.writestr("cpu_stacks.folded", sampler.folded())
+        if torch_profiler is not None:
+            archive.writestr("torch_ops.txt", torch_profiler.table())
+            archive.writestr("torch_trace.json", torch_profiler.chrome_trace())
+    return buffer.getvalue()
+
+
+def timing_header(timings: Dict[str, float]) -> str:
+    """Server-Timing style value: 'queue;dur=1.20, forward;dur=35.10, ...'"""
+    return ", ".join(
+        f"{name};dur={value:.2f}" if name != "batch_size" else f"{name};desc={value}"
+        for name, value in timings.items()
+    )
@@ -1,5 +1,5 @@
 import pandas as pd
-import re
+from rules import current_rules
 
 def get_combined_text(row):
     """Combine relevant text fields for better classification"""
@@ -8,86 +8,23 @@ def get_combined_text(row):
     ann_type = str(row['ANNOUNCEMENT_TYPE']).lower() if pd.notna(row['ANNOUNCEMENT_TYPE']) else ''
     return f"{headline} {description} {ann_type}"
 
-def classify_row(row):
+def classify_row(row, rules=None):
     """
     Classify a single announcement row based on its content
     Returns: classification label
     """
-    text = get_combined_text(row)
-    
-    # Define classification patterns
-    patterns = {
-        'Financial Results': [
-            'financial result', 'quarterly result', 'annual result',
-            'unaudited financial', 'audited financial', 'financial statement',
-            'statement of profit', 'statement of loss'
-        ],
-        'Board Meeting': [
-            'board meeting', 'meeting of board', 'board of director',
-            'board meeting intimation'
-        ],
-        'Shareholder Meeting': [
-            'agm', 'annual general meeting', 'egm', 'extraordinary general meeting',
-            'postal ballot', 'shareholder meeting', 'general meeting'
-        ],
-        'Investor Relations': [
-            'investor meet', 'analyst meet', 'earnings call', 'investor presentation',
-            'investor conference', 'conference call', 'earnings presentation'
-        ],
-        'Regulatory Compliance': [
-            'regulation 30', 'regulation 33', 'sebi regulation', 'compliance certificate',
-            'statutory compliance', 'regulatory requirement'
-        ],
-        'Corporate Action': [
-            'dividend', 'bonus', 'stock split', 'rights issue', 'buyback',
-            'share transfer', 'capital reduction'
-        ],
-        'Press Release': [
-            'press release', 'media release', 'news release',
-            'press statement', 'media statement'
-        ],
-        'Management Changes': [
-            'appointment of director', 'resignation of director',
-            'key managerial', 'change in director', 'new appointment'
-        ],
-        'Trading Update': [
-            'trading window', 'insider trading', 'trading update',
-            'trading statement', 'market update'
-        ],
-        'Business Update': [
-            'business update', 'operational update', 'company update',
-            'corporate update', 'strategic update'
-        ],
-        'Credit Rating': [
-            'credit rating', 'rating agency', 'credit update',
-            'rating revision', 'rating reaffirm'
-        ],
-        'Merger/Acquisition': [
-            'merger', 'acquisition', 'amalgamation', 'takeover',
-            'scheme of arrangement'
-        ]
-    }
-    
-    # Check each pattern
-    for category, pattern_list in patterns.items():
-        if any(pattern in text for pattern in pattern_list):
-            return category
-            
-    # Special case for board meetings with financial results
-    if any(term in text for term in patterns['Board Meeting']):
-        if any(term in text for term in patterns['Financial Results']):
-            return 'Financial Results - Board Meeting'
-    
-    # Default category
-    return 'Other Announcements'
+    # Patterns come from the versioned rules file, compiled once per version
+    rules = rules or current_rules().announcement_types
+    return rules.classify(get_combined_text(row))
 
 def main():
     # Read the CSV file
     input_file = "Jan22_bse_announcements_classified.csv"
     df = pd.read_csv(input_file)
     
-    # Apply classification to each row
-    df['Row_Classification'] = df.apply(classify_row, axis=1)
+    # Apply classification to each row, using one rules version for the whole file
+    rules = current_rules().announcement_types
+    df['Row_Classification'] = df.apply(classify_row, axis=1, rules=rules)
     
     # Save the classified data
     output_file = "bse_announcements_row_classified.csv"
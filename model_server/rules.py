@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.environ.get("RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+
+
+class KeywordRuleSet:
+    """
+    Ordered keyword categories compiled into one regex per category.
+    The first category with any keyword occurring in the text wins, then compound
+    rules (all listed categories present) are checked, then the default applies.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], default: str, compound: Optional[List[Dict]] = None):
+        self.keywords = {category: list(keywords) for category, keywords in categories.items()}
+        self.default = default
+        self.compound = [(rule["category"], list(rule["all_of"])) for rule in (compound or [])]
+        self._matchers = []
+        for category, keywords in self.keywords.items():
+            if keywords:
+                # Longest first so the alternation reports the most specific keyword
+                alternation = "|".join(re.escape(k.lower()) for k in sorted(keywords, key=len, reverse=True))
+                self._matchers.append((category, re.compile(alternation)))
+        self._by_category = dict(self._matchers)
+        for category, required in self.compound:
+            missing = [name for name in required if name not in self.keywords]
+            if missing:
+                raise ValueError(f"Compound rule {category} refers to unknown categories: {', '.join(missing)}")
+
+    def matches(self, category: str, text: str) -> bool:
+        """Whether any keyword of the category occurs in the (lower-cased) text"""
+        matcher = self._by_category.get(category)
+        return matcher is not None and matcher.search(text) is not None
+
+    def classify(self, text: str) -> str:
+        """Classify lower-cased text"""
+        for category, matcher in self._matchers:
+            if matcher.search(text):
+                return category
+        for category, required in self.compound:
+            if all(self.matches(name, text) for name in required):
+                return category
+        return self.default
+
+
+class SentimentLexicon:
+    """Word sets per sentiment label"""
+
+    def __init__(self, words: Dict[str, List[str]]):
+        self.words: Dict[str, FrozenSet[str]] = {label.lower(): frozenset(w.lower() for w in ws)
+                                                  for label, ws in words.items()}
+
+
+class CompiledRules:
+    """One immutable, fully compiled version of the rules file"""
+
+    def __init__(self, version: str, announcement_types: KeywordRuleSet, bse_categories: KeywordRuleSet,
+                 sentiment: SentimentLexicon, source: str = None):
+        self.version = version
+        self.announcement_types = announcement_types
+        self.bse_categories = bse_categories
+        self.sentiment = sentiment
+        self.source = source
+        self.loaded_at = datetime.now()
+
+    @classmethod
+    def from_dict(cls, config: Dict, source: str = None) -> "CompiledRules":
+        if "version" not in config:
+            raise ValueError("Rules file must declare a version")
+        rule_sets = config["rule_sets"]
+        return cls(
+            version=str(config["version"]),
+            announcement_types=KeywordRuleSet(**rule_sets["announcement_types"]),
+            bse_categories=KeywordRuleSet(**rule_sets["bse_categories"]),
+            sentiment=SentimentLexicon(rule_sets["sentiment"]["words"]),
+            source=source
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "CompiledRules":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), source=path)
+
+
+class RuleStore:
+    """
+    Holds the current CompiledRules and swaps in new versions when the file changes.
+
+    Callers take a snapshot with `store.current` and use it for a whole unit of work
+    (a request, a file), so in-flight work keeps the version it started with. A new
+    version is parsed and compiled completely before a single reference assignment
+    makes it visible; a file that fails to load leaves the running version in place.
+    """
+
+    def __init__(self, path: str = DEFAULT_RULES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_state = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self._current = CompiledRules.from_file(path)
+        self._file_state = self._stat()
+        logger.info("Loaded rules version %s from %s", self._current.version, path)
+
+    @property
+    def current(self) -> CompiledRules:
+        return self._current
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self) -> bool:
+        """Load and compile the file, swapping it in on success. Returns True if swapped."""
+        with self._lock:
+            file_state = self._stat()
+            try:
+                rules = CompiledRules.from_file(self.path)
+            except Exception as e:
+                logger.error("Keeping rules version %s, failed to load %s: %s", self._current.version, self.path, e)
+                self._file_state = file_state
+                return False
+            previous = self._current
+            self._current = rules
+            self._file_state = file_state
+            logger.info("Swapped rules version %s -> %s", previous.version, rules.version)
+            return True
+
+    def reload_if_changed(self) -> bool:
+        if self._stat() == self._file_state:
+            return False
+        return self.reload()
+
+    def start_watching(self, interval: float = 2.0):
+        """Poll the rules file in a background thread and hot-swap on change"""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=watch, name="rules-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_rule_store() -> RuleStore:
+    """Process-wide RuleStore for DEFAULT_RULES_PATH, created on first use"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = RuleStore()
+    return _default_store
+
+
+def current_rules() -> CompiledRules:
+    return get_rule_store().current
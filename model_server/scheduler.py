@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+
+from span_decoding import SpanFilter, batch_predict
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+
+class _PendingRequest:
+    __slots__ = ("key", "text", "future", "enqueued_at", "timings")
+
+    def __init__(self, key, text, future, timings=None):
+        self.key = key
+        self.text = text
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.timings = timings   # stage durations (ms) are written here when the caller asks for them
+
+
+class _Lane:
+    """One priority class: FIFO sub-queues per (model, labels, span filter) so batches stay homogeneous"""
+
+    def __init__(self, name: str, weight: int, max_batch_size: int, max_wait_ms: float):
+        self.name = name
+        self.weight = weight
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.current_weight = 0
+        self.queues: "OrderedDict[tuple, deque]" = OrderedDict()
+        self.pending = 0
+        self.served = 0
+        self.batches = 0
+
+    def put(self, pending: _PendingRequest):
+        self.queues.setdefault(pending.key, deque()).append(pending)
+        self.pending += 1
+
+    def oldest(self) -> Optional[_PendingRequest]:
+        return min((queue[0] for queue in self.queues.values()), key=lambda p: p.enqueued_at, default=None)
+
+    def take(self) -> List[_PendingRequest]:
+        """Up to max_batch_size requests of the key whose head has waited longest"""
+        head = self.oldest()
+        queue = self.queues[head.key]
+        batch = []
+        while queue and len(batch) < self.max_batch_size:
+            pending = queue.popleft()
+            self.pending -= 1
+            # Skip requests whose caller went away (client disconnect, failed sibling in a batch call)
+            if not pending.future.cancelled():
+                batch.append(pending)
+        if not queue:
+            del self.queues[head.key]
+        return batch
+
+    def ready(self, now: float) -> bool:
+        """Full batch available, or the oldest request has used up its wait window"""
+        head = self.oldest()
+        if head is None:
+            return False
+        return (len(self.queues[head.key]) >= self.max_batch_size
+                or (now - head.enqueued_at) * 1000 >= self.max_wait_ms)
+
+
+class BatchScheduler:
+    """
+    Micro-batching front end for NER with priority lanes.
+
+    Requests are queued in an interactive or a bulk lane. The scheduler repeatedly picks a
+    lane by smooth weighted round-robin among the lanes that are ready, takes one
+    micro-batch of requests sharing (model, labels, span filter), and runs it as one
+    span_decoding.batch_predict call on a dedicated inference thread. Bulk work is cut into
+    small micro-batches, so an interactive request waits for at most one of them.
+    Interactive requests wait up to max_wait_ms for company in their batch.
+    """
+
+    def __init__(self, registry, max_batch_size: int = 16, max_wait_ms: float = 5.0,
+                 bulk_batch_size: int = 8, interactive_weight: int = 8, bulk_weight: int = 1):
+        self.registry = registry
+        self.lanes = {
+            INTERACTIVE: _Lane(INTERACTIVE, interactive_weight, max_batch_size, max_wait_ms),
+            BULK: _Lane(BULK, bulk_weight, bulk_batch_size, 0.0),
+        }
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        # One inference thread: the model parallelizes internally and batches run back to back
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    def configure(self, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None,
+                  bulk_batch_size: Optional[int] = None):
+        """Change batching settings; takes effect from the next micro-batch"""
+        interactive, bulk = self.lanes[INTERACTIVE], self.lanes[BULK]
+        if max_batch_size is not None:
+            interactive.max_batch_size = max(1, int(max_batch_size))
+        if max_wait_ms is not None:
+            interactive.max_wait_ms = max(0.0, float(max_wait_ms))
+        if bulk_batch_size is not None:
+            bulk.max_batch_size = max(1, int(bulk_batch_size))
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        # A worker left behind on another (closed) event loop cannot serve this one
+        if self._worker is None or self._worker.get_loop() is not loop or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def _enqueue(self, text: str, labels: List[str], threshold: Union[float, SpanFilter], model: Optional[str],
+                 priority: str, timings: Optional[Dict] = None):
+        if priority not in self.lanes:
+            raise ValueError(f"Unknown priority: {priority}")
+        future = asyncio.get_running_loop().create_future()
+        # A text without words has no entities. It is answered here rather than batched: GLiNER
+        # cannot collate it, and the error would fail every request co-batched with it
+        if not text.strip():
+            future.set_result([])
+            return future
+        span_filter = threshold if isinstance(threshold, SpanFilter) else SpanFilter(threshold)
+        key = (model or self.registry.default, tuple(labels), span_filter)
+        self.lanes[priority].put(_PendingRequest(key, text, future, timings))
+        return future
+
+    async def predict(self, text: str, labels: List[str], threshold: Union[float, SpanFilter] = 0.5,
+                      model: Optional[str] = None, priority: str = INTERACTIVE,
+                      timings: Optional[Dict] = None) -> List[Dict]:
+        """
+        Queue one text and wait for its entities. `threshold` is a float or a SpanFilter with
+        per-label options. Pass a dict as timings to get a stage breakdown.
+        """
+        # Started lazily when the app is driven without lifespan events (e.g. in-process clients)
+        await self.start()
+        future = self._enqueue(text, labels, threshold, model, priority, timings)
+        self._wakeup.set()
+        return await future
+
+    async def predict_many(self, texts: List[str], labels: List[str], threshold: Union[float, SpanFilter] = 0.5,
+                           model: Optional[str] = None, priority: str = BULK) -> List[List[Dict]]:
+        """Queue many texts at once; results come back in input order"""
+        await self.start()
+        futures = [self._enqueue(text, labels, threshold, model, priority) for text in texts]
+        self._wakeup.set()
+        try:
+            return list(await asyncio.gather(*futures))
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _pick_lane(self, now: float) -> Optional[_Lane]:
+        """Smooth weighted round-robin over the lanes that have a batch ready"""
+        ready = [lane for lane in self.lanes.values() if lane.ready(now)]
+        if not ready:
+            return None
+        total = 0
+        for lane in ready:
+            lane.current_weight += lane.weight
+            total += lane.weight
+        chosen = max(ready, key=lambda lane: lane.current_weight)
+        chosen.current_weight -= total
+        return chosen
+
+    def _next_deadline(self, now: float) -> Optional[float]:
+        """Seconds until the earliest waiting lane becomes ready"""
+        waits = []
+        for lane in self.lanes.values():
+            head = lane.oldest()
+            if head is not None:
+                waits.append(max(0.0, head.enqueued_at + lane.max_wait_ms / 1000 - now))
+        return min(waits) if waits else None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = time.perf_counter()
+            lane = self._pick_lane(now)
+            if lane is None:
+                self._wakeup.clear()
+                timeout = self._next_deadline(now)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            batch = lane.take()
+            if batch:
+                lane.served += len(batch)
+                lane.batches += 1
+                await self._run_batch(loop, batch)
+
+    async def run_in_inference_thread(self, fn, *args):
+        """Run fn on the inference thread, between batches (used to start and stop thread-bound profilers)"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _run_batch(self, loop, items: List[_PendingRequest]):
+        model_name, labels, span_filter = items[0].key
+        texts = [pending.text for pending in items]
+        # Stages are only timed for batches holding a request that asked for timings
+        stages = {} if any(pending.timings is not None for pending in items) else None
+        batch_start = time.perf_counter()
+        try:
+            with self.registry.acquire(model_name) as ner_model:
+                results = await loop.run_in_executor(
+                    self._executor, batch_predict, ner_model, texts, list(labels), span_filter, stages
+                )
+        except Exception as e:
+            for pending in items:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        for pending, entities in zip(items, results):
+            if pending.timings is not None:
+                pending.timings["queue"] = (batch_start - pending.enqueued_at) * 1000
+                pending.timings.update(stages)
+                pending.timings["batch_size"] = len(items)
+            if not pending.future.done():
+                pending.future.set_result(entities)
+
+    def stats(self) -> Dict:
+        return {
+            name: {
+                "queued": lane.pending,
+                "served": lane.served,
+                "batches": lane.batches,
+                "weight": lane.weight,
+                "max_batch_size": lane.max_batch_size,
+                "max_wait_ms": lane.max_wait_ms,
+            }
+            for name, lane in self.lanes.items()
+        }
@@ -0,0 +1,222 @@
+"""
+GLiNER span decoding with per-label thresholds, per-label top-k and a maximum span width.
+
+batch_predict rebuilds GLiNER's batch_predict_entities from its internals (collate_fn,
+compute_score_eval) and replaces the per-candidate Python decoding with tensor operations
+over the full [batch, words, widths, labels] score matrix:
+
+- thresholds, the span width limit and the text length are one boolean mask
+- greedy flat overlap resolution (highest score first, drop spans overlapping a kept one)
+  runs in parallel rounds over per-word coverage of the candidates
+- top-k keeps the k highest-scoring decoded entities of each label
+
+With a plain threshold the entities are the same as batch_predict_entities returns. Each
+stage can be timed for X-Debug-Timing breakdowns.
+"""
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+# Word splitting used by GLiNER's batch_predict_entities
+_WORD = re.compile(r"\w+(?:[-_]\w+)*|\S")
+
+
+class SpanFilter(NamedTuple):
+    """Decoding options; hashable so requests with the same options share a micro-batch"""
+    threshold: float = 0.5
+    label_thresholds: Tuple[Tuple[str, float], ...] = ()
+    top_k: Tuple[Tuple[str, int], ...] = ()
+    max_width: Optional[int] = None  # in words
+
+    @classmethod
+    def build(cls, labels: List[str], threshold: float = 0.5, label_thresholds: Optional[Dict[str, float]] = None,
+              top_k: Union[int, Dict[str, int], None] = None, max_width: Optional[int] = None) -> "SpanFilter":
+        """Validate request options; an integer top_k applies to every label"""
+        label_thresholds = label_thresholds or {}
+        if isinstance(top_k, int):
+            top_k = {label: top_k for label in labels}
+        top_k = top_k or {}
+        unknown = [label for label in list(label_thresholds) + list(top_k) if label not in labels]
+        if unknown:
+            raise ValueError(f"Options given for labels not in the request: {', '.join(sorted(set(unknown)))}")
+        if not all(0 <= value < 1 for value in [threshold, *label_thresholds.values()]):
+            raise ValueError("Thresholds must be between 0 and 1")
+        if any(k < 1 for k in top_k.values()) or (max_width is not None and max_width < 1):
+            raise ValueError("top_k and max_span_width must be at least 1")
+        return cls(threshold, tuple(sorted(label_thresholds.items())), tuple(sorted(top_k.items())), max_width)
+
+    def label_threshold(self, label: str) -> float:
+        return dict(self.label_thresholds).get(label, self.threshold)
+
+    @property
+    def min_threshold(self) -> float:
+        """Lowest threshold of any label; models without GLiNER internals are run at this one"""
+        return min([self.threshold] + [value for _, value in self.label_thresholds])
+
+    def apply(self, entities: List[Dict]) -> List[Dict]:
+        """
+        Filter entities decoded at min_threshold (models without GLiNER internals). Thresholds and
+        top-k use the entity's `score`. An entity without one is only known to pass min_threshold,
+        so it is dropped for labels with a higher threshold.
+        """
+        if self.label_thresholds:
+            entities = [entity for entity in entities
+                        if (entity["score"] > self.label_threshold(entity["label"]) if "score" in entity
+                            else self.label_threshold(entity["label"]) <= self.min_threshold)]
+        if self.max_width:
+            entities = [entity for entity in entities if len(_WORD.findall(entity["text"])) <= self.max_width]
+        if self.top_k:
+            limits = dict(self.top_k)
+            kept, counts = set(), {}
+            for index in sorted(range(len(entities)), key=lambda i: -entities[i].get("score", 0.0)):
+                label = entities[index]["label"]
+                if label not in limits or counts.get(label, 0) < limits[label]:
+                    counts[label] = counts.get(label, 0) + 1
+                    kept.add(index)
+            entities = [entity for index, entity in enumerate(entities) if index in kept]
+        return entities
+
+
+def _greedy_flat(starts, ends):
+    """
+    Greedy flat overlap resolution of candidates already sorted by descending score: a
+    candidate is kept unless it shares a word with a kept, higher-scoring one. Resolved in
+    rounds over the unsettled candidates: those overlapping a kept span are dropped, then
+    those with no higher-scoring unsettled candidate on any of their words are kept.
+    Overlaps are found through per-word coverage, so a round costs O(candidates x span width).
+    Returns a boolean keep mask.
+    """
+    import torch
+
+    n = len(starts)
+    # Words covered by each candidate; short spans repeat their last word
+    words = torch.minimum(starts.view(n, 1) + torch.arange(int((ends - starts).max()) + 1), ends.view(n, 1))
+    num_words = int(ends.max()) + 1
+    keep = torch.zeros(n, dtype=torch.bool)
+    taken = torch.zeros(num_words, dtype=torch.bool)
+    active = torch.arange(n)
+    while len(active):
+        active = active[~taken[words[active]].any(1)]
+        active_words = words[active]
+        # Best (lowest) rank among the unsettled candidates on each word
+        best = torch.full((num_words,), n).scatter_reduce(
+            0, active_words.flatten(), active.view(-1, 1).expand_as(active_words).flatten(), "amin")
+        free = best[active_words].amin(1) == active
+        kept = active[free]
+        keep[kept] = True
+        taken[words[kept].flatten()] = True
+        active = active[~free]
+    return keep
+
+
+def _top_k(classes, limits, num_classes: int):
+    """Keep mask for the first `limits[c]` candidates of each class c (0 = no limit); input in score order"""
+    import torch
+
+    one_hot = torch.nn.functional.one_hot(classes, num_classes)
+    rank = (one_hot.cumsum(0) * one_hot).sum(1) - 1
+    limit = limits[classes]
+    return (limit == 0) | (rank < limit)
+
+
+def decode_spans(scores, lengths: List[int], class_thresholds, max_width: Optional[int] = None,
+                 class_top_k=None) -> List[List[Tuple[int, int, int, float]]]:
+    """
+    Decode compute_score_eval output ([batch, words, widths, classes] logits) into
+    (start word, end word, class index, probability) per text, ordered by start.
+    class_thresholds is a [classes] tensor of probability thresholds; class_top_k a [classes]
+    tensor of per-class limits (0 = no limit) or None.
+    """
+    import torch
+
+    batch_size, num_words, num_widths, num_classes = scores.shape
+    probabilities = torch.sigmoid(scores)
+    widths = torch.arange(num_widths).view(1, 1, num_widths)
+    in_text = torch.arange(num_words).view(1, num_words, 1) + widths < torch.tensor(lengths).view(batch_size, 1, 1)
+    if max_width:
+        in_text &= widths < max_width
+    candidates = (probabilities > class_thresholds.to(probabilities.dtype)) & in_text.unsqueeze(-1)
+
+    # All candidates of the batch in (text, start, width, class) order, which is also the order
+    # GLiNER considers them in; a stable sort by score then breaks ties the same way
+    index = candidates.nonzero()
+    if not len(index):
+        return [[] for _ in range(batch_size)]
+    span_scores, span_probabilities = scores[candidates], probabilities[candidates]
+    order = torch.sort(span_scores, descending=True, stable=True).indices
+    texts, starts, widths = index[order, 0], index[order, 1], index[order, 2]
+    # The whole batch is resolved at once; words of different texts are numbered apart so they never overlap
+    chosen = order[_greedy_flat(texts * num_words + starts, texts * num_words + starts + widths)]
+    if class_top_k is not None:
+        text_classes = index[chosen, 0] * num_classes + index[chosen, 3]
+        chosen = chosen[_top_k(text_classes, class_top_k.repeat(batch_size), batch_size * num_classes)]
+    chosen = chosen[torch.argsort(index[chosen, 0] * num_words + index[chosen, 1])]
+
+    spans = index[chosen]
+    counts = torch.bincount(spans[:, 0], minlength=batch_size).tolist()
+    rows = list(zip(spans[:, 1].tolist(), (spans[:, 1] + spans[:, 2]).tolist(), spans[:, 3].tolist(),
+                    span_probabilities[chosen].tolist()))
+    results, offset = [], 0
+    for count in counts:
+        results.append(rows[offset:offset + count])
+        offset += count
+    return results
+
+
+def has_span_scores(model) -> bool:
+    """Whether the model exposes the GLiNER internals the vectorized decoder needs"""
+    return hasattr(model, "collate_fn") and hasattr(model, "compute_score_eval")
+
+
+def batch_predict(model, texts: List[str], labels: List[str], span_filter: Optional[SpanFilter] = None,
+                  stages: Optional[Dict[str, float]] = None) -> List[List[Dict]]:
+    """
+    Entities per text as {start, end, text, label, score} dicts. Stage durations in ms are
+    written to `stages` when given; models without GLiNER internals are run through
+    batch_predict_entities and timed as a single "inference" stage.
+    """
+    span_filter = span_filter or SpanFilter()
+    if not has_span_scores(model):
+        start_time = time.perf_counter()
+        results = [span_filter.apply(entities) for entities in
+                   model.batch_predict_entities(texts, labels, threshold=span_filter.min_threshold)]
+        if stages is not None:
+            stages["inference"] = (time.perf_counter() - start_time) * 1000
+        return results
+
+    import torch
+
+    start_time = time.perf_counter()
+    words = [list(_WORD.finditer(text)) for text in texts]
+    x = model.collate_fn([{"tokenized_text": [m.group() for m in matches], "ner": None} for matches in words], labels)
+    tokenized = time.perf_counter()
+
+    model.eval()
+    with torch.no_grad():
+        scores = model.compute_score_eval(x, device=next(model.parameters()).device)
+    forwarded = time.perf_counter()
+
+    scores = scores.float().cpu()
+    class_labels = [x["id_to_classes"][c + 1] for c in range(scores.shape[-1])]
+    class_thresholds = torch.tensor([span_filter.label_threshold(label) for label in class_labels])
+    class_top_k = None
+    if span_filter.top_k:
+        limits = dict(span_filter.top_k)
+        class_top_k = torch.tensor([limits.get(label, 0) for label in class_labels])
+    spans = decode_spans(scores, [len(tokens) for tokens in x["tokens"]], class_thresholds,
+                         span_filter.max_width, class_top_k)
+    results = []
+    for text, matches, text_spans in zip(texts, words, spans):
+        entities = []
+        for start, end, label, probability in text_spans:
+            begin, finish = matches[start].start(), matches[end].end()
+            entities.append({"start": begin, "end": finish, "text": text[begin:finish],
+                             "label": class_labels[label], "score": probability})
+        results.append(entities)
+    decoded = time.perf_counter()
+
+    if stages is not None:
+        stages["tokenize"] = (tokenized - start_time) * 1000
+        stages["forward"] = (forwarded - tokenized) * 1000
+        stages["decode"] = (decoded - forwarded) * 1000
+    return results
@@ -0,0 +1,131 @@
+"""
+Checks CompanyAggregates against a naive recount of every recorded announcement.
+
+The aggregates keep running totals in a per-company ring of day slots and patch later slots for
+late arrivals; the naive model keeps the raw events and sums the window on every query.
+
+    python test_company_stats.py    (or python -m pytest test_company_stats.py)
+"""
+import os
+import random
+import tempfile
+
+from company_stats import CompanyAggregates, SENTIMENT_LABELS
+
+MAX_DAYS = 30
+FIRST_DAY = 738000
+CATEGORIES = ["Order Wins", "Acquisitions", "Buyback", "Board Meeting", "Other"]
+
+
+class NaiveAggregates:
+    """Raw events per company; an event older than max_days before the company's last day is dropped"""
+
+    def __init__(self, max_days: int):
+        self.max_days = max_days
+        self.events = {}
+        self.last_day = {}
+        self.latest_day = None
+        self.dropped = 0
+
+    def add(self, scrip_cd, day, category, scores):
+        last = self.last_day.get(scrip_cd, day)
+        if day < last - self.max_days:
+            self.dropped += 1
+            return
+        self.last_day[scrip_cd] = max(last, day)
+        self.latest_day = day if self.latest_day is None else max(self.latest_day, day)
+        self.events.setdefault(scrip_cd, []).append((day, category, scores))
+
+    def query(self, scrip_cd, days):
+        start = self.latest_day - days
+        window = [event for event in self.events.get(scrip_cd, []) if start < event[0] <= self.latest_day]
+        scored = [scores for _, _, scores in window if scores is not None]
+        categories = {}
+        for _, category, _ in window:
+            categories[category] = categories.get(category, 0) + 1
+        return {
+            "announcements": len(window),
+            "sentiment": {
+                label: (sum(scores[label] for scores in scored) / len(scored) if scored else None)
+                for label in SENTIMENT_LABELS
+            },
+            "categories": categories,
+        }
+
+
+def _events(count: int, companies: int, seed: int):
+    """Announcements in rough day order, with late arrivals both inside and beyond the window"""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        day = FIRST_DAY + rng.randint(0, 4 * MAX_DAYS)
+        scores = ({label: rng.random() for label in SENTIMENT_LABELS} if rng.random() < 0.8 else None)
+        events.append((str(rng.randint(1, companies)), day, rng.choice(CATEGORIES), scores))
+    events.sort(key=lambda event: event[1] + rng.choice([0, 0, 0, -3, -MAX_DAYS - 5]))
+    return events
+
+
+def _assert_same(aggregates: CompanyAggregates, naive: NaiveAggregates, companies: int):
+    for scrip_cd in map(str, range(1, companies + 1)):
+        for days in (1, 2, 7, MAX_DAYS):
+            expected = naive.query(scrip_cd, days)
+            actual = aggregates.query(scrip_cd, days)
+            if actual is None:
+                assert expected["announcements"] == 0, (scrip_cd, days)
+                continue
+            assert actual["announcements"] == expected["announcements"], (scrip_cd, days)
+            assert actual["categories"] == expected["categories"], (scrip_cd, days)
+            for label in SENTIMENT_LABELS:
+                want, got = expected["sentiment"][label], actual["sentiment"][label]
+                assert (want is None and got is None) or abs(want - got) < 1e-9, (scrip_cd, days, label)
+
+
+def test_windows_match_naive_recount():
+    companies = 25
+    aggregates = CompanyAggregates(max_days=MAX_DAYS, initial_capacity=2)
+    naive = NaiveAggregates(MAX_DAYS)
+    for index, (scrip_cd, day, category, scores) in enumerate(_events(6000, companies, seed=1)):
+        aggregates.add(scrip_cd, day, category, scores)
+        naive.add(scrip_cd, day, category, scores)
+        if index % 500 == 0:
+            _assert_same(aggregates, naive, companies)
+    _assert_same(aggregates, naive, companies)
+    assert aggregates.dropped == naive.dropped > 0
+
+
+def test_top_matches_naive_ranking():
+    companies = 25
+    aggregates = CompanyAggregates(max_days=MAX_DAYS)
+    naive = NaiveAggregates(MAX_DAYS)
+    for scrip_cd, day, category, scores in _events(3000, companies, seed=2):
+        aggregates.add(scrip_cd, day, category, scores)
+        naive.add(scrip_cd, day, category, scores)
+    for days in (1, 7, MAX_DAYS):
+        counts = {scrip_cd: naive.query(scrip_cd, days)["announcements"] for scrip_cd in map(str, range(1, companies + 1))}
+        top = aggregates.top(days, limit=5)
+        assert [company["announcements"] for company in top] == sorted(counts.values(), reverse=True)[:5]
+        assert all(counts[company["scrip_cd"]] == company["announcements"] for company in top)
+        bearish = aggregates.top(days, sort_by="bearish", limit=3)
+        means = [company["sentiment"]["bearish"] for company in bearish]
+        assert means == sorted(means, reverse=True)
+
+
+def test_save_load_round_trip():
+    aggregates = CompanyAggregates(max_days=MAX_DAYS)
+    for scrip_cd, day, category, scores in _events(1000, 10, seed=3):
+        aggregates.add(scrip_cd, day, category, scores, company_name=f"Company {scrip_cd}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "company_stats.npz")
+        aggregates.save(path)
+        loaded = CompanyAggregates.load(path)
+    for scrip_cd in map(str, range(1, 11)):
+        assert loaded.query(scrip_cd, 7) == aggregates.query(scrip_cd, 7)
+    # New categories and companies keep working after a load
+    loaded.add("99", aggregates.latest_day, "New Category", None)
+    assert loaded.query("99", 1)["categories"] == {"New Category": 1}
+
+
+if __name__ == "__main__":
+    for test in (test_windows_match_naive_recount, test_top_matches_naive_ranking, test_save_load_round_trip):
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,186 @@
+"""
+Checks the vectorized span decoding in span_decoding.py against GLiNER's own decoding.
+
+The model is a GLiNER stand-in that runs the real collate_fn, predict and batch_predict_entities
+code of gliner 0.1.3 but replaces the encoder with deterministic random logits, so no weights
+are downloaded and every candidate span gets a score.
+
+- with a plain threshold, batch_predict must return what batch_predict_entities returns
+- with per-label thresholds, top-k and a span width limit it must match a loop reference
+  built on GLiNER's greedy_search
+- models without GLiNER internals return entities without scores; those must not pass a
+  per-label threshold above the one the model was run at
+- decode_spans must match a pure Python greedy decoder on random score tensors
+
+    python test_span_decoding.py    (or python -m pytest test_span_decoding.py)
+"""
+import random
+import types
+import zlib
+
+import torch
+from gliner.model import GLiNER
+from gliner.modules.base import InstructBase
+from gliner.modules.evaluator import greedy_search
+
+from span_decoding import SpanFilter, _WORD, batch_predict, decode_spans
+from workload import load_corpus
+
+LABELS = ["Company", "Person", "Sector"]
+
+
+class _StubGLiNER(InstructBase):
+    """GLiNER with the encoder replaced by random logits seeded from the text"""
+
+    predict = GLiNER.predict
+    predict_entities = GLiNER.predict_entities
+    batch_predict_entities = GLiNER.batch_predict_entities
+
+    def __init__(self, max_width: int = 12, max_len: int = 384):
+        super().__init__(types.SimpleNamespace(max_width=max_width, max_len=max_len))
+        self.dummy = torch.nn.Parameter(torch.zeros(1))
+
+    def compute_score_eval(self, x, device):
+        # Seeded per text so the scores do not depend on how texts are batched
+        num_words = int(x["seq_length"].max())
+        scores = torch.full((len(x["tokens"]), num_words, self.max_width, len(x["classes_to_id"])), -10.0)
+        for i, tokens in enumerate(x["tokens"]):
+            generator = torch.Generator().manual_seed(zlib.crc32(" ".join(tokens).encode()))
+            scores[i, :len(tokens)] = torch.randn(len(tokens), self.max_width, scores.shape[-1], generator=generator) * 2 - 1
+        return scores
+
+
+def _corpus() -> list:
+    texts = load_corpus("Jan22_bse_announcements.csv", 120)
+    # One text longer than max_len, so truncation is covered
+    return texts + [" ".join(load_corpus("Jan22_bse_announcements.csv", 40))[:2500]]
+
+
+def _without_scores(results):
+    return [[{key: entity[key] for key in ("start", "end", "text", "label")} for entity in entities]
+            for entities in results]
+
+
+def _reference(model, text: str, span_filter: SpanFilter) -> list:
+    """GLiNER's per-candidate decoding loop, extended with the SpanFilter options"""
+    words = list(_WORD.finditer(text))
+    x = model.collate_fn([{"tokenized_text": [word.group() for word in words], "ner": None}], LABELS)
+    scores = model.compute_score_eval(x, "cpu")[0]
+    length = len(x["tokens"][0])
+    spans = []
+    for start, width, label in zip(*torch.where(torch.ones_like(scores, dtype=torch.bool))):
+        start, width, label = start.item(), width.item(), x["id_to_classes"][label.item() + 1]
+        score = scores[start, width, LABELS.index(label)].item()
+        if start + width >= length or (span_filter.max_width and width >= span_filter.max_width):
+            continue
+        if torch.sigmoid(torch.tensor(score)) > span_filter.label_threshold(label):
+            spans.append((start, start + width, label, score))
+    score_of = {span[:3]: span[3] for span in spans}
+    kept = greedy_search(spans, True)
+    if span_filter.top_k:
+        limits, counts, chosen = dict(span_filter.top_k), {}, set()
+        for span in sorted(kept, key=lambda span: -score_of[span]):
+            if span[2] not in limits or counts.get(span[2], 0) < limits[span[2]]:
+                counts[span[2]] = counts.get(span[2], 0) + 1
+                chosen.add(span)
+        kept = [span for span in kept if span in chosen]
+    return [{"start": words[start].start(), "end": words[end].end(),
+             "text": text[words[start].start():words[end].end()], "label": label}
+            for start, end, label in kept]
+
+
+def test_plain_threshold_matches_batch_predict_entities():
+    model, texts = _StubGLiNER(), _corpus()
+    for threshold in (0.3, 0.5, 0.8, 0.95):
+        for batch_size in (1, 16, 64):
+            for i in range(0, len(texts), batch_size):
+                batch = texts[i:i + batch_size]
+                ours = _without_scores(batch_predict(model, batch, LABELS, SpanFilter(threshold)))
+                assert ours == model.batch_predict_entities(batch, LABELS, threshold=threshold), (threshold, batch_size)
+
+
+def test_options_match_loop_reference():
+    model, texts = _StubGLiNER(), _corpus()
+    rng = random.Random(0)
+    for _ in range(40):
+        span_filter = SpanFilter.build(
+            LABELS, threshold=rng.choice([0.3, 0.5, 0.7]),
+            label_thresholds={label: rng.choice([0.2, 0.6, 0.9]) for label in rng.sample(LABELS, rng.randint(0, 3))},
+            top_k=rng.choice([None, 1, 2, {"Company": 1}, {"Sector": 3, "Person": 1}]),
+            max_width=rng.choice([None, 1, 3, 6]))
+        sample = rng.sample(texts, 8)
+        expected = [_reference(model, text, span_filter) for text in sample]
+        assert _without_scores(batch_predict(model, sample, LABELS, span_filter)) == expected, span_filter
+
+
+class _EntitiesOnly:
+    """A model exposing only batch_predict_entities, whose entities carry no score (as in gliner 0.1.3)"""
+
+    def __init__(self, model):
+        self.batch_predict_entities = model.batch_predict_entities
+
+
+def test_unscored_entities_fail_higher_label_thresholds():
+    model, texts = _StubGLiNER(), _corpus()[:32]
+    span_filter = SpanFilter.build(LABELS, threshold=0.5, label_thresholds={"Person": 0.9, "Sector": 0.3})
+    results = batch_predict(_EntitiesOnly(model), texts, LABELS, span_filter)
+    # Run at the lowest threshold; only labels at that threshold can be trusted without a score
+    expected = [[entity for entity in entities if entity["label"] == "Sector"]
+                for entities in model.batch_predict_entities(texts, LABELS, threshold=0.3)]
+    assert results == expected
+    assert any(results)
+
+
+def _greedy_reference(scores, length, thresholds, max_width, top_k):
+    """Pure Python decoder for one text of decode_spans input"""
+    probabilities = torch.sigmoid(scores)
+    candidates = []
+    for start in range(scores.shape[0]):
+        for width in range(scores.shape[1]):
+            if start + width >= length or (max_width and width >= max_width):
+                continue
+            for label in range(scores.shape[2]):
+                if probabilities[start, width, label] > thresholds[label]:
+                    candidates.append((scores[start, width, label].item(), start, start + width, label))
+    # Stable, so equal scores keep (start, width, class) order
+    candidates.sort(key=lambda candidate: -candidate[0])
+    kept = []
+    for score, start, end, label in candidates:
+        if all(end < other_start or start > other_end for _, other_start, other_end, _ in kept):
+            kept.append((score, start, end, label))
+    if top_k is not None:
+        counts, limited = {}, []
+        for candidate in kept:
+            label = candidate[3]
+            if not top_k[label] or counts.get(label, 0) < top_k[label]:
+                counts[label] = counts.get(label, 0) + 1
+                limited.append(candidate)
+        kept = limited
+    return [(start, end, label, torch.sigmoid(torch.tensor(score)).item())
+            for score, start, end, label in sorted(kept, key=lambda candidate: candidate[1])]
+
+
+def test_decode_spans_matches_greedy_reference():
+    generator = torch.Generator().manual_seed(0)
+    rng = random.Random(0)
+    for _ in range(30):
+        batch_size, num_words, num_widths, num_classes = rng.randint(1, 6), rng.randint(1, 40), rng.randint(1, 8), rng.randint(1, 4)
+        scores = torch.randn(batch_size, num_words, num_widths, num_classes, generator=generator) * 2
+        # Rounded scores give ties, which must be broken in candidate order
+        scores = torch.round(scores * 4) / 4
+        lengths = [rng.randint(0, num_words) for _ in range(batch_size)]
+        thresholds = torch.tensor([rng.choice([0.2, 0.5, 0.8]) for _ in range(num_classes)])
+        max_width = rng.choice([None, 1, 3])
+        top_k = rng.choice([None, torch.tensor([rng.randint(0, 3) for _ in range(num_classes)])])
+        decoded = decode_spans(scores, lengths, thresholds, max_width, top_k)
+        for text_scores, length, spans in zip(scores, lengths, decoded):
+            expected = _greedy_reference(text_scores, length, thresholds, max_width, top_k)
+            assert [span[:3] for span in spans] == [span[:3] for span in expected]
+            assert all(abs(span[3] - reference[3]) < 1e-6 for span, reference in zip(spans, expected))
+
+
+if __name__ == "__main__":
+    for test in (test_plain_threshold_matches_batch_predict_entities, test_options_match_loop_reference,
+                 test_unscored_entities_fail_higher_label_thresholds, test_decode_spans_matches_greedy_reference):
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,43 @@
+"""
+Sample workload shared by the benchmark, the autotuner and the tests: a request corpus built
+from the BSE announcements CSV, the labels requested with it, and latency summaries.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from bse_classification import iter_rows
+
+NER_LABELS = ["Company", "Person", "Sector"]
+SENTIMENT_LABELS = ["bullish", "bearish", "neutral"]
+
+
+def load_corpus(file_path: str, limit: int = None) -> List[str]:
+    """Build the request corpus from announcement headlines and descriptions"""
+    corpus = []
+    for headline, description in iter_rows(file_path, ['HEADLINE', 'DESCRIPTION_1']):
+        corpus.append(f"{headline}. {description}".strip(". "))
+        if limit and len(corpus) >= limit:
+            break
+    return corpus
+
+
+def summarize_latencies(latencies_ms: List[float], errors: int, elapsed_s: float) -> Dict:
+    """RPS and latency percentiles for one endpoint"""
+    completed = len(latencies_ms)
+    summary = {
+        "requests": completed + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed_s, 3),
+        "rps": round(completed / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+    }
+    if completed:
+        values = np.asarray(latencies_ms)
+        summary.update({
+            "mean_ms": round(float(values.mean()), 3),
+            "p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3),
+            "p99_ms": round(float(np.percentile(values, 99)), 3),
+            "max_ms": round(float(values.max()), 3),
+        })
+    return summary